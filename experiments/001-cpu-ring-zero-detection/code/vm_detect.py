@@ -12,13 +12,87 @@ Multiple detection vectors:
 """
 
 import time
-import subprocess
+from array import array
 import os
+import sys
+import re
+import functools
 import platform
 import statistics
 import json
 from datetime import datetime
 
+# /proc/cpuinfo fields, matched against the first CPU block only
+_CPUINFO_FIELD_RE = re.compile(rb'(?m)^(?P<k>vendor_id|model name|flags)\s*:\s*(?P<v>.*)$')
+
+# Hypervisor / cloud vendor strings seen in DMI values
+_VM_SIG_RE = re.compile(
+    rb'vmware|virtualbox|kvm|qemu|xen|hyper-v|parallels|bochs|amazon|google|microsoft',
+    re.IGNORECASE,
+)
+
+# MAC OUI prefixes registered to hypervisor / cloud vendors
+_VM_OUIS = {
+    '00:50:56': 'VMware',
+    '00:0c:29': 'VMware',
+    '00:1c:42': 'Parallels',
+    '00:03:ff': 'Microsoft Hyper-V',
+    '00:15:5d': 'Microsoft Hyper-V',
+    '00:16:3e': 'Xen',
+    '08:00:27': 'VirtualBox',
+    '52:54:00': 'QEMU/KVM',
+    'fa:16:3e': 'OpenStack',
+    '02:42:': 'Docker',
+    '02:fc:': 'Firecracker/Cloud',
+}
+
+# Disk vendor/model substrings -> display name
+_VM_DISK_NAMES = {b'vbox': 'VBOX', b'qemu': 'QEMU', b'virtual': 'Virtual', b'vmware': 'VMware', b'xen': 'Xen'}
+_VM_DISK_RE = re.compile(b'|'.join(_VM_DISK_NAMES), re.IGNORECASE)
+
+# Kernel modules that betray a hypervisor (host or guest side)
+_VM_MODULES = {
+    'kvm': 'KVM host',
+    'kvm_intel': 'KVM host (Intel)',
+    'kvm_amd': 'KVM host (AMD)',
+    'vboxdrv': 'VirtualBox host',
+    'vboxguest': 'VirtualBox guest',
+    'vmw_balloon': 'VMware guest',
+    'vmw_vmci': 'VMware guest',
+    'vmwgfx': 'VMware guest',
+    'hv_vmbus': 'Hyper-V guest',
+    'hv_storvsc': 'Hyper-V guest',
+    'xen_blkfront': 'Xen guest',
+    'virtio': 'virtio (KVM/QEMU)',
+    'virtio_pci': 'virtio (KVM/QEMU)',
+    'virtio_blk': 'virtio (KVM/QEMU)',
+    'virtio_net': 'virtio (KVM/QEMU)',
+}
+
+# CLOCK_MONOTONIC_COARSE is a pure vDSO read (never touches TSC/HPET) but only
+# ticks once per jiffy. CPython does not always export the constant.
+_CLOCK_COARSE = getattr(time, 'CLOCK_MONOTONIC_COARSE',
+                        6 if sys.platform.startswith('linux') else None)
+
+@functools.lru_cache(maxsize=None)
+def _read_small(path, n=256):
+    """Read a tiny static sysfs file with one unbuffered read; raises OSError"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, n).strip(b'\x00\n\r ')
+    finally:
+        os.close(fd)
+
+def _sleep_clock():
+    """Return (now_fn, resolution_s, name) for the sleep accuracy test"""
+    if _CLOCK_COARSE is not None:
+        try:
+            res = time.clock_getres(_CLOCK_COARSE)
+            return functools.partial(time.clock_gettime, _CLOCK_COARSE), res, 'CLOCK_MONOTONIC_COARSE'
+        except OSError:
+            pass
+    return time.perf_counter, time.get_clock_info('perf_counter').resolution, 'perf_counter'
+
 def banner(text):
     print(f"\n{'='*60}")
     print(f" {text}")
@@ -36,35 +110,42 @@ def check_cpu_features():
     }
     
     try:
-        with open('/proc/cpuinfo', 'r') as f:
+        with open('/proc/cpuinfo', 'rb') as f:
             cpuinfo = f.read()
         
         # Look for hypervisor flag
-        if 'hypervisor' in cpuinfo:
+        if b'hypervisor' in cpuinfo:
             print("⚠️  'hypervisor' flag present in CPU flags!")
             results['hypervisor_flag'] = True
         
-        # Print relevant lines (only first CPU)
-        seen_model = False
-        for line in cpuinfo.split('\n'):
-            if 'model name' in line.lower() and not seen_model:
-                results['model'] = line.split(':')[1].strip()
-                print(f"Model: {results['model']}")
-                seen_model = True
-            elif 'vendor_id' in line.lower() and not results['vendor']:
-                results['vendor'] = line.split(':')[1].strip()
-                print(f"Vendor: {results['vendor']}")
-            elif 'flags' in line.lower() and not results['flags']:
-                flags = line.split(':')[1].strip().split()
-                results['flags'] = flags
-                print(f"CPU Flags ({len(flags)} total)")
-                if 'hypervisor' in flags:
-                    print("  ⚠️  HYPERVISOR FLAG DETECTED in flags list")
-                # Show some interesting flags
-                interesting = ['vmx', 'svm', 'hypervisor', 'kvm', 'vme']
-                found = [f for f in flags if f in interesting]
-                if found:
-                    print(f"  Interesting flags: {', '.join(found)}")
+        # Only the first CPU block is relevant; the rest are duplicates.
+        # Slice it through a memoryview so the buffer is never copied.
+        end = cpuinfo.find(b'\n\n')
+        first_cpu = memoryview(cpuinfo)[:end if end != -1 else len(cpuinfo)]
+        fields = {}
+        for m in _CPUINFO_FIELD_RE.finditer(first_cpu):
+            fields.setdefault(m['k'], m['v'])
+        
+        if b'vendor_id' in fields:
+            results['vendor'] = fields[b'vendor_id'].strip().decode('latin1')
+            print(f"Vendor: {results['vendor']}")
+        
+        if b'model name' in fields:
+            results['model'] = fields[b'model name'].strip().decode('latin1')
+            print(f"Model: {results['model']}")
+        
+        if b'flags' in fields:
+            flags_bytes = fields[b'flags'].split()
+            flagset = frozenset(flags_bytes)
+            results['flags'] = [f.decode('latin1') for f in flags_bytes]
+            print(f"CPU Flags ({len(flags_bytes)} total)")
+            if b'hypervisor' in flagset:
+                print("  ⚠️  HYPERVISOR FLAG DETECTED in flags list")
+            # Show some interesting flags
+            interesting = frozenset([b'vmx', b'svm', b'hypervisor', b'kvm', b'vme'])
+            found = [f.decode() for f in flags_bytes if f in interesting]
+            if found:
+                print(f"  Interesting flags: {', '.join(found)}")
     except Exception as e:
         print(f"ERROR reading cpuinfo: {e}")
     
@@ -83,23 +164,22 @@ def check_dmi_info():
         '/sys/devices/virtual/dmi/id/product_name',
     ]
     
-    vm_signatures = ['vmware', 'virtualbox', 'kvm', 'qemu', 'xen', 'hyper-v', 'parallels', 'bochs', 'amazon', 'google', 'microsoft']
-    
     results = {}
     detected_vm = None
     
     for path in dmi_checks:
         try:
-            with open(path, 'r') as f:
-                value = f.read().strip()
-                results[path] = value
-                print(f"✓ {os.path.basename(path)}: {value}")
-                
-                # Check for VM signatures
-                for sig in vm_signatures:
-                    if sig in value.lower():
-                        detected_vm = sig
-                        print(f"  ⚠️  VM SIGNATURE DETECTED: {sig}")
+            raw = _read_small(path)
+            value = raw.decode('latin1')
+            results[path] = value
+            print(f"✓ {os.path.basename(path)}: {value}")
+            
+            # Check for VM signatures (one positive is enough)
+            if detected_vm is None:
+                m = _VM_SIG_RE.search(raw)
+                if m:
+                    detected_vm = m.group(0).decode().lower()
+                    print(f"  ⚠️  VM SIGNATURE DETECTED: {detected_vm}")
         except FileNotFoundError:
             results[path] = None
             print(f"✗ {os.path.basename(path)}: not found")
@@ -134,13 +214,31 @@ def check_vm_files():
     results = {}
     detected = []
     
+    # One directory listing per parent instead of a stat per path; the
+    # DirEntry also answers is_file() from d_type without another stat
+    by_dir = {}
+    for path in vm_indicators:
+        by_dir.setdefault(os.path.dirname(path), []).append(path)
+    
+    present = {}
+    for parent, paths in by_dir.items():
+        try:
+            with os.scandir(parent) as it:
+                entries = {e.name: e for e in it}
+        except OSError:
+            continue
+        for path in paths:
+            entry = entries.get(os.path.basename(path))
+            if entry is not None:
+                present[path] = entry
+    
     for path, desc in vm_indicators.items():
-        exists = os.path.exists(path)
+        exists = path in present
         results[path] = exists
         if exists:
             detected.append(desc)
             try:
-                if os.path.isfile(path):
+                if present[path].is_file():
                     with open(path, 'r') as f:
                         content = f.read().strip()[:100]
                     print(f"✓ {path} ({desc}): {content}")
@@ -158,38 +256,32 @@ def check_mac_address():
     """Check MAC address OUI for VM vendors"""
     banner("MAC Address VM Detection")
     
-    vm_ouis = {
-        '00:50:56': 'VMware',
-        '00:0c:29': 'VMware',
-        '00:1c:42': 'Parallels',
-        '00:03:ff': 'Microsoft Hyper-V',
-        '00:15:5d': 'Microsoft Hyper-V',
-        '00:16:3e': 'Xen',
-        '08:00:27': 'VirtualBox',
-        '52:54:00': 'QEMU/KVM',
-        'fa:16:3e': 'OpenStack',
-        '02:42:': 'Docker',
-        '02:fc:': 'Firecracker/Cloud',
-    }
-    
     results = {'macs': [], 'detected': []}
     
     try:
-        result = subprocess.run(['ip', 'link'], capture_output=True, text=True)
-        output = result.stdout
-        print(output)
-        
-        # Extract MAC addresses
-        import re
-        macs = re.findall(r'link/ether ([0-9a-f:]+)', output, re.IGNORECASE)
+        # Read sysfs directly rather than spawning `ip link` and regex-parsing it
+        macs = []
+        with os.scandir('/sys/class/net') as it:
+            ifaces = sorted(e.name for e in it)
+        for iface in ifaces:
+            try:
+                with open(f'/sys/class/net/{iface}/address', 'rb') as f:
+                    mac = f.read().strip().decode('ascii')
+            except OSError:
+                continue
+            print(f"  {iface}: {mac or '(none)'}")
+            if mac and mac != '00:00:00:00:00:00':
+                macs.append(mac)
         results['macs'] = macs
         
         for mac in macs:
-            mac_prefix = mac[:8].lower()
-            for oui, vendor in vm_ouis.items():
-                if mac.lower().startswith(oui.lower()):
-                    results['detected'].append({'mac': mac, 'vendor': vendor})
-                    print(f"⚠️  DETECTED: {vendor} MAC prefix ({oui}) -> {mac}")
+            # Full 3-byte OUIs are 8 chars, the short ones 6 ('02:42:')
+            mac_lower = mac.lower()
+            oui = mac_lower[:8] if mac_lower[:8] in _VM_OUIS else mac_lower[:6]
+            vendor = _VM_OUIS.get(oui)
+            if vendor:
+                results['detected'].append({'mac': mac, 'vendor': vendor})
+                print(f"⚠️  DETECTED: {vendor} MAC prefix ({oui}) -> {mac}")
     except Exception as e:
         print(f"ERROR: {e}")
     
@@ -207,55 +299,81 @@ def timing_test():
     
     # Test 1: Measure time to make simple syscalls
     print("\n[Test 1] Syscall timing (getpid)...")
-    times = []
-    for _ in range(1000):
-        start = time.perf_counter_ns()
-        os.getpid()
-        end = time.perf_counter_ns()
-        times.append(end - start)
-    
-    results['syscall_times'] = times
-    mean = statistics.mean(times)
+    # Preallocated int64 buffer and local names keep the timer bracket tight
+    times = array('q', bytes(8 * 1000))
+    pc = time.perf_counter_ns
+    gp = os.getpid
+    for i in range(1000):
+        start = pc()
+        gp()
+        times[i] = pc() - start
+    
+    results['syscall_times'] = times.tolist()
+    mean = statistics.fmean(times)
     median = statistics.median(times)
-    stdev = statistics.stdev(times)
+    stdev = statistics.stdev(times, mean)
+    min_ns = min(times)
+    max_ns = max(times)
     results['stats']['syscall'] = {
         'mean_ns': mean,
         'median_ns': median,
         'stdev_ns': stdev,
-        'min_ns': min(times),
-        'max_ns': max(times)
+        'min_ns': min_ns,
+        'max_ns': max_ns
     }
     
     print(f"  Mean:   {mean:.2f} ns")
     print(f"  Median: {median:.2f} ns")
     print(f"  StdDev: {stdev:.2f} ns")
-    print(f"  Min:    {min(times)} ns")
-    print(f"  Max:    {max(times)} ns")
+    print(f"  Min:    {min_ns} ns")
+    print(f"  Max:    {max_ns} ns")
     
     # High variance often indicates VM
     if stdev > mean * 0.5:
         print(f"  ⚠️  High variance detected - possible VM indicator")
     
     # Test 2: Sleep accuracy
-    print("\n[Test 2] Sleep accuracy (1ms sleeps)...")
-    sleep_errors = []
-    for _ in range(100):
-        target = 0.001  # 1ms
-        start = time.perf_counter()
-        time.sleep(target)
-        actual = time.perf_counter() - start
-        error = (actual - target) * 1000  # in ms
-        sleep_errors.append(error)
-    
+    # Errors are absolute overshoot in ms, so a longer target on the coarse
+    # clock (one tick is ~4ms) stays comparable with the 1ms threshold below
+    now, res, clock_name = _sleep_clock()
+    target = 0.001 if res < 1e-4 else 0.010
+    print(f"\n[Test 2] Sleep accuracy ({target * 1000:.0f}ms sleeps, {clock_name}, "
+          f"resolution {res * 1000:.3f} ms)...")
+    # Only raw durations are recorded inside the loop; the error math runs
+    # once afterwards so it can't add to the measured interval
+    # Each sleep is also timed with perf_counter: single samples on the coarse
+    # clock are quantized to a tick, so the tail statistics come from there
+    durations = array('d', bytes(8 * 100))
+    fine_durations = array('d', bytes(8 * 100))
+    sleep = time.sleep
+    fine_now = time.perf_counter
+    for i in range(100):
+        fine_start = fine_now()
+        start = now()
+        sleep(target)
+        durations[i] = now() - start
+        fine_durations[i] = fine_now() - fine_start
+    
+    sleep_errors = [(d - target) * 1000 for d in durations]  # in ms
     results['sleep_accuracy'] = sleep_errors
-    mean_err = statistics.mean(sleep_errors)
+    mean_err = statistics.fmean(sleep_errors)
+    # p99 and max catch rare long stalls that the mean hides
+    fine_errors = [(d - target) * 1000 for d in fine_durations]
+    max_err = max(fine_errors)
+    p99_err = statistics.quantiles(fine_errors, n=100)[-1]
     results['stats']['sleep'] = {
+        'clock': clock_name,
+        'clock_resolution_ms': res * 1000,
+        'target_ms': target * 1000,
         'mean_error_ms': mean_err,
-        'max_error_ms': max(sleep_errors)
+        'p99_error_ms': p99_err,
+        'max_error_ms': max_err,
+        'tail_clock': 'perf_counter'
     }
     
     print(f"  Mean error: {mean_err:.3f} ms")
-    print(f"  Max error:  {max(sleep_errors):.3f} ms")
+    print(f"  P99 error:  {p99_err:.3f} ms (perf_counter)")
+    print(f"  Max error:  {max_err:.3f} ms (perf_counter)")
     
     if mean_err > 1.0:
         print(f"  ⚠️  High sleep error - possible VM/container indicator")
@@ -300,37 +418,20 @@ def check_kernel_modules():
     """Check loaded kernel modules for VM indicators"""
     banner("Kernel Module Analysis")
     
-    vm_modules = {
-        'kvm': 'KVM host',
-        'kvm_intel': 'KVM host (Intel)',
-        'kvm_amd': 'KVM host (AMD)',
-        'vboxdrv': 'VirtualBox host',
-        'vboxguest': 'VirtualBox guest',
-        'vmw_balloon': 'VMware guest',
-        'vmw_vmci': 'VMware guest',
-        'vmwgfx': 'VMware guest',
-        'hv_vmbus': 'Hyper-V guest',
-        'hv_storvsc': 'Hyper-V guest',
-        'xen_blkfront': 'Xen guest',
-        'virtio': 'virtio (KVM/QEMU)',
-        'virtio_pci': 'virtio (KVM/QEMU)',
-        'virtio_blk': 'virtio (KVM/QEMU)',
-        'virtio_net': 'virtio (KVM/QEMU)',
-    }
-    
     results = {'modules': [], 'detected': []}
     
     try:
         with open('/proc/modules', 'r') as f:
             modules = f.read()
         
-        loaded = [line.split()[0] for line in modules.strip().split('\n') if line]
+        loaded = [line.split(' ', 1)[0] for line in modules.splitlines() if line]
+        loaded_set = frozenset(loaded)
         results['modules'] = loaded
         
         print(f"Loaded modules ({len(loaded)} total):")
         
-        for mod, desc in vm_modules.items():
-            if mod in loaded:
+        for mod, desc in _VM_MODULES.items():
+            if mod in loaded_set:
                 results['detected'].append({'module': mod, 'type': desc})
                 print(f"  ⚠️  {mod} ({desc})")
         
@@ -348,45 +449,61 @@ def check_disk_info():
     
     results = {'devices': [], 'detected': []}
     
+    def read_attr(path):
+        try:
+            return _read_small(path)
+        except OSError:
+            return b''
+    
     try:
-        result = subprocess.run(['lsblk', '-o', 'NAME,SIZE,TYPE,MODEL'], capture_output=True, text=True)
-        print(result.stdout)
+        # Same data lsblk would report, read from sysfs without the fork/exec
+        with os.scandir('/sys/block') as it:
+            devices = sorted(e.name for e in it)
+        
+        print(f"{'NAME':<10} {'SIZE':>8}  MODEL")
+        found = {}
+        for dev in devices:
+            sectors = read_attr(f'/sys/block/{dev}/size')
+            size = int(sectors) * 512 if sectors.isdigit() else 0
+            model = b' '.join(filter(None, (read_attr(f'/sys/block/{dev}/device/vendor'),
+                                            read_attr(f'/sys/block/{dev}/device/model'))))
+            model_str = model.decode('latin1')
+            results['devices'].append({'name': dev, 'size_bytes': size, 'model': model_str})
+            print(f"{dev:<10} {size / 2**30:>7.1f}G  {model_str}")
+            
+            for m in _VM_DISK_RE.finditer(model):
+                found.setdefault(m.group(0).lower(), None)
         
-        vm_disk_names = ['VBOX', 'QEMU', 'Virtual', 'VMware', 'Xen']
-        for name in vm_disk_names:
-            if name.lower() in result.stdout.lower():
-                results['detected'].append(name)
-                print(f"⚠️  VM disk signature: {name}")
+        for key in found:
+            name = _VM_DISK_NAMES[key]
+            results['detected'].append(name)
+            print(f"⚠️  VM disk signature: {name}")
     except Exception as e:
         print(f"ERROR: {e}")
     
     return results
 
+# (key path into all_results, value -> evidence lines); checked in order
+_EVIDENCE = (
+    (('cpu', 'hypervisor_flag'), lambda v: ["CPU hypervisor flag set"]),
+    (('dmi', 'detected_vm'), lambda v: [f"DMI signature: {v}"]),
+    (('files', 'detected'), lambda v: [f"VM files: {', '.join(v)}"]),
+    (('mac', 'detected'), lambda v: [f"MAC vendor: {d['vendor']}" for d in v]),
+    (('cgroups', 'in_container'), lambda v: ["Container cgroup detected"]),
+    (('modules', 'detected'), lambda v: [f"Kernel module: {d['module']} ({d['type']})" for d in v]),
+)
+
 def generate_verdict(all_results):
     """Generate final verdict based on all evidence"""
     banner("FINAL VERDICT")
     
     evidence = []
-    
-    if all_results.get('cpu', {}).get('hypervisor_flag'):
-        evidence.append("CPU hypervisor flag set")
-    
-    if all_results.get('dmi', {}).get('detected_vm'):
-        evidence.append(f"DMI signature: {all_results['dmi']['detected_vm']}")
-    
-    if all_results.get('files', {}).get('detected'):
-        evidence.append(f"VM files: {', '.join(all_results['files']['detected'])}")
-    
-    if all_results.get('mac', {}).get('detected'):
-        for d in all_results['mac']['detected']:
-            evidence.append(f"MAC vendor: {d['vendor']}")
-    
-    if all_results.get('cgroups', {}).get('in_container'):
-        evidence.append("Container cgroup detected")
-    
-    if all_results.get('modules', {}).get('detected'):
-        for d in all_results['modules']['detected']:
-            evidence.append(f"Kernel module: {d['module']} ({d['type']})")
+    for path, describe in _EVIDENCE:
+        value = all_results
+        for key in path:
+            value = (value or {}).get(key)
+        if value:
+            evidence.extend(describe(value))
     
     if evidence:
         print("🔴 VIRTUALIZED ENVIRONMENT DETECTED")
@@ -433,19 +550,9 @@ def main():
     print(" RAW JSON OUTPUT")
     print("=" * 60)
     
-    # Convert to JSON-safe format
-    def make_serializable(obj):
-        if isinstance(obj, dict):
-            return {k: make_serializable(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [make_serializable(v) for v in obj]
-        elif isinstance(obj, (int, float, str, bool, type(None))):
-            return obj
-        else:
-            return str(obj)
-    
-    json_output = json.dumps(make_serializable(all_results), indent=2)
-    print(json_output)
+    # Serialize straight to stdout; anything json can't encode falls back to str
+    json.dump(all_results, sys.stdout, indent=2, default=str)
+    print()
     
     return all_results
 
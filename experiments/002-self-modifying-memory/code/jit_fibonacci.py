@@ -5,6 +5,8 @@ This proves we can generate non-trivial algorithms as machine code.
 """
 import mmap
 import ctypes
+import struct
+import functools
 
 print("=" * 60)
 print("EXTREME VALIDATION: JIT-compiled Fibonacci")
@@ -18,70 +20,38 @@ print("=" * 60)
 #     return b;
 # }
 
-# Let me build this more carefully with correct offsets
-fibonacci_code = bytearray()
-
+# The layout is fixed, so assemble from a template and only patch the two
+# rel8 branch displacements (both are known from the offsets below)
 # edi = n (first arg in System V ABI)
-
-# cmp edi, 1
-fibonacci_code.extend([0x83, 0xff, 0x01])
-# jle to return_n (we'll patch this)
-fibonacci_code.extend([0x7e, 0x00])  # placeholder, offset 4
-jle_patch_pos = len(fibonacci_code) - 1
-
-# xor eax, eax  (a = 0)
-fibonacci_code.extend([0x31, 0xc0])
-
-# mov edx, 1  (b = 1)
-fibonacci_code.extend([0xba, 0x01, 0x00, 0x00, 0x00])
-
-# mov ecx, 2  (i = 2)
-fibonacci_code.extend([0xb9, 0x02, 0x00, 0x00, 0x00])
-
-# loop_start:
-loop_start = len(fibonacci_code)
-
-# mov esi, edx  (temp = b)
-fibonacci_code.extend([0x89, 0xd6])
-
-# add esi, eax  (temp = a + b)
-fibonacci_code.extend([0x01, 0xc6])
-
-# mov eax, edx  (a = b)
-fibonacci_code.extend([0x89, 0xd0])
-
-# mov edx, esi  (b = temp)
-fibonacci_code.extend([0x89, 0xf2])
-
-# inc ecx  (i++)
-fibonacci_code.extend([0xff, 0xc1])
-
-# cmp ecx, edi  (i <= n?)
-fibonacci_code.extend([0x39, 0xf9])
-
-# jle loop_start
-loop_end = len(fibonacci_code)
-offset_to_loop = loop_start - (loop_end + 2)  # +2 for jle instruction size
-fibonacci_code.extend([0x7e, offset_to_loop & 0xff])
-
-# mov eax, edx  (return b)
-fibonacci_code.extend([0x89, 0xd0])
-
-# ret
-fibonacci_code.extend([0xc3])
-
-# return_n: (for n <= 1, return n)
-return_n_pos = len(fibonacci_code)
-
-# mov eax, edi  (return n)
-fibonacci_code.extend([0x89, 0xf8])
-
-# ret
-fibonacci_code.extend([0xc3])
-
-# Patch the jle offset
+fibonacci_template = bytes.fromhex(
+    '83ff01'      # 00: cmp edi, 1
+    '7e00'        # 03: jle return_n (patched)
+    '31c0'        # 05: xor eax, eax  (a = 0)
+    'ba01000000'  # 07: mov edx, 1    (b = 1)
+    'b902000000'  # 0c: mov ecx, 2    (i = 2)
+    '89d6'        # 11: loop_start: mov esi, edx  (temp = b)
+    '01c6'        # 13: add esi, eax  (temp = a + b)
+    '89d0'        # 15: mov eax, edx  (a = b)
+    '89f2'        # 17: mov edx, esi  (b = temp)
+    'ffc1'        # 19: inc ecx       (i++)
+    '39f9'        # 1b: cmp ecx, edi  (i <= n?)
+    '7e00'        # 1d: jle loop_start (patched)
+    '89d0'        # 1f: mov eax, edx  (return b)
+    'c3'          # 21: ret
+    '89f8'        # 22: return_n: mov eax, edi  (return n)
+    'c3'          # 24: ret
+)
+jle_patch_pos = 0x04
+loop_start = 0x11
+loop_jle_pos = 0x1d
+return_n_pos = 0x22
+
+fibonacci_code = bytearray(fibonacci_template)
+
+# Patch the jle offsets (rel8 is relative to the next instruction)
 jle_target_offset = return_n_pos - (jle_patch_pos + 1)
-fibonacci_code[jle_patch_pos] = jle_target_offset & 0xff
+struct.pack_into('<b', fibonacci_code, jle_patch_pos, jle_target_offset)
+struct.pack_into('<b', fibonacci_code, loop_jle_pos + 1, loop_start - (loop_jle_pos + 2))
 
 fibonacci_code = bytes(fibonacci_code)
 
@@ -128,6 +98,39 @@ mem_addr = ctypes.addressof(ctypes.c_char.from_buffer(mem))
 FUNC_TYPE = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int)
 fib_jit = FUNC_TYPE(mem_addr)
 
+# Batched variant: fib_batch(n, iters) recomputes fib(n) iters times in a
+# native loop and returns the last result, so the ctypes call is paid once
+# per batch instead of once per fib(n). Inner body is the same loop as above.
+# edi = n, esi = iters; r8d is the (caller-saved) outer counter
+fib_batch_code = bytes.fromhex(
+    '4189f0'      # 00: mov r8d, esi
+    '31c0'        # 03: xor eax, eax
+    '4585c0'      # 05: test r8d, r8d
+    '7e28'        # 08: jle done
+    '89f8'        # 0a: outer: mov eax, edi  (fib(n) = n for n <= 1)
+    '83ff01'      # 0c: cmp edi, 1
+    '7e1c'        # 0f: jle next
+    '31c0'        # 11: xor eax, eax
+    'ba01000000'  # 13: mov edx, 1
+    'b902000000'  # 18: mov ecx, 2
+    '89d6'        # 1d: loop: mov esi, edx
+    '01c6'        # 1f: add esi, eax
+    '89d0'        # 21: mov eax, edx
+    '89f2'        # 23: mov edx, esi
+    'ffc1'        # 25: inc ecx
+    '39f9'        # 27: cmp ecx, edi
+    '7ef2'        # 29: jle loop
+    '89d0'        # 2b: mov eax, edx
+    '41ffc8'      # 2d: next: dec r8d
+    '75d8'        # 30: jnz outer
+    'c3'          # 32: done: ret
+)
+batch_offset = 64
+mem.seek(batch_offset)
+mem.write(fib_batch_code)
+BATCH_FUNC_TYPE = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_int)
+fib_jit_batch = BATCH_FUNC_TYPE(mem_addr + batch_offset)
+
 # Python reference implementation
 def fib_python(n):
     if n <= 1:
@@ -137,6 +140,20 @@ def fib_python(n):
         a, b = b, a + b
     return b
 
+# Specialization: when n is known at JIT time, fold fib(n) to a constant and
+# emit `mov eax, imm32; ret`. One 8-byte slot per n, generated on first use.
+const_offset = 128
+const_slot_size = 8
+CONST_FUNC_TYPE = ctypes.CFUNCTYPE(ctypes.c_int)
+
+@functools.lru_cache(maxsize=None)
+def fib_specialized(n):
+    slot = const_offset + const_slot_size * fib_specialized.cache_info().currsize
+    if slot + const_slot_size > len(mem):
+        raise MemoryError("out of specialization slots")
+    mem[slot:slot + 6] = b'\xb8' + struct.pack('<I', fib_python(n) & 0xFFFFFFFF) + b'\xc3'
+    return CONST_FUNC_TYPE(mem_addr + slot)
+
 print("\nComparing JIT vs Python Fibonacci:")
 print("-" * 40)
 
@@ -149,6 +166,11 @@ for n in range(20):
     if jit_result != py_result:
         all_match = False
 
+for n in (0, 1, 10, 30):
+    if fib_specialized(n)() != fib_python(n):
+        print(f"  ✗ specialized fib({n}) mismatch")
+        all_match = False
+
 print("-" * 40)
 if all_match:
     print("🎉 ALL 20 VALUES MATCH!")
@@ -162,19 +184,39 @@ import time
 if all_match:
     print("\nPerformance comparison (fib(30) x 100000):")
     n = 30
+    iters = 100000
 
     start = time.perf_counter()
-    for _ in range(100000):
+    for _ in range(iters):
         fib_jit(n)
     jit_time = time.perf_counter() - start
 
+    # One ctypes crossing for the whole batch: measures the generated code,
+    # not the FFI overhead that dominates the per-call loop above
+    start = time.perf_counter()
+    batch_result = fib_jit_batch(n, iters)
+    batch_time = time.perf_counter() - start
+
+    # Constant-folded fib(30): the call does no work, so this is the bare
+    # ctypes round-trip cost
+    fib_const = fib_specialized(n)
+    start = time.perf_counter()
+    for _ in range(iters):
+        fib_const()
+    const_time = time.perf_counter() - start
+
     start = time.perf_counter()
-    for _ in range(100000):
+    for _ in range(iters):
         fib_python(n)
     py_time = time.perf_counter() - start
 
-    print(f"  JIT:    {jit_time:.4f}s")
-    print(f"  Python: {py_time:.4f}s")
-    print(f"  Speedup: {py_time/jit_time:.1f}x faster")
+    print(f"  JIT (per call): {jit_time:.4f}s")
+    print(f"  JIT (batched):  {batch_time:.4f}s  -> fib({n}) = {batch_result}")
+    print(f"  JIT (constant): {const_time:.4f}s  -> fib({n}) = {fib_const()}")
+    print(f"  Python:         {py_time:.4f}s")
+    print(f"  Speedup (per call): {py_time/jit_time:.1f}x faster")
+    print(f"  Speedup (batched):  {py_time/batch_time:.1f}x faster")
+    print(f"  ctypes overhead: ~{const_time / iters * 1e9:.0f} ns/call "
+          f"(per call - batched: ~{(jit_time - batch_time) / iters * 1e9:.0f} ns)")
 
 mem.close()
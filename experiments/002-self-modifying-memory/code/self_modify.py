@@ -18,10 +18,38 @@ import os
 import sys
 import ctypes
 import struct
+import time
 import mmap
+import re
 import traceback
 from ctypes import CFUNCTYPE, c_int, c_void_p, c_char_p, c_size_t
 
+# Per-iteration diagnostics (hex dumps) only when run as a script, so the
+# hot loops stay free of string formatting when the module is imported
+VERBOSE = __name__ == "__main__"
+
+# Executable mappings in /proc/<pid>/maps: start-end perms offset dev inode path
+_MAP_RE = re.compile(rb'^([0-9a-f]+)-([0-9a-f]+) (r-xp) \S+ \S+ \S+\s+(\S.*)$', re.M)
+
+# One RWX arena for every generated function below: a single mmap syscall,
+# with jit_alloc() bumping through it instead of mapping a page per demo
+_JIT_ARENA_SIZE = 2 * 1024 * 1024
+_JIT_ARENA = mmap.mmap(-1, _JIT_ARENA_SIZE,
+                       prot=mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC,
+                       flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+_JIT_VIEW = memoryview(_JIT_ARENA)
+_JIT_BASE = ctypes.addressof(ctypes.c_char.from_buffer(_JIT_ARENA))
+_JIT_BUMP = 0
+
+def jit_alloc(nbytes, align=64):
+    """Carve nbytes of executable memory from the arena -> (view, address)"""
+    global _JIT_BUMP
+    start = -(-_JIT_BUMP // align) * align
+    if start + nbytes > _JIT_ARENA_SIZE:
+        raise MemoryError("JIT arena exhausted")
+    _JIT_BUMP = start + nbytes
+    return _JIT_VIEW[start:start + nbytes], _JIT_BASE + start
+
 print("=" * 70)
 print(" EXPERIMENT 002: Self-Modifying Code via /proc/self/mem")
 print("=" * 70)
@@ -38,25 +66,23 @@ try:
     print(f"PID: {pid}")
     
     # Read memory maps to find code sections
-    with open(f"/proc/{pid}/maps", "r") as f:
+    with open(f"/proc/{pid}/maps", "rb") as f:
         maps_content = f.read()
     
     print("\nMemory map (first 20 lines):")
-    for i, line in enumerate(maps_content.split('\n')[:20]):
-        print(f"  {line}")
+    for line in maps_content.split(b'\n', 20)[:20]:
+        print(f"  {line.decode()}")
     
     # Find the python executable's code section
     code_sections = []
-    for line in maps_content.split('\n'):
-        if 'r-xp' in line and ('python' in line.lower() or 'libc' in line.lower()):
-            parts = line.split()
-            addr_range = parts[0]
-            start, end = addr_range.split('-')
+    for m in _MAP_RE.finditer(maps_content):
+        path = m[4].lower()
+        if b'python' in path or b'libc' in path:
             code_sections.append({
-                'start': int(start, 16),
-                'end': int(end, 16),
-                'perms': parts[1],
-                'path': parts[-1] if len(parts) > 5 else '[anonymous]'
+                'start': int(m[1], 16),
+                'end': int(m[2], 16),
+                'perms': m[3].decode(),
+                'path': os.fsdecode(m[4])
             })
     
     print(f"\n✓ Found {len(code_sections)} executable code sections")
@@ -74,16 +100,25 @@ print("\n" + "=" * 70)
 print("[PART 2] Reading actual machine code from memory...")
 print("-" * 50)
 
+# One unbuffered handle on /proc/self/mem serves Parts 2 and 3; pread/pwrite
+# avoid reopening the file and carry no seek state between accesses
+mem_file = None
+mem_write_error = None
+
 try:
     if code_sections:
         target = code_sections[0]
         print(f"Target section: {target['path']}")
         print(f"Address range: {hex(target['start'])} - {hex(target['end'])}")
         
-        # Try to read via /proc/self/mem
-        with open(f"/proc/{pid}/mem", "rb") as mem:
-            mem.seek(target['start'])
-            code_bytes = mem.read(64)
+        # Try to read via /proc/self/mem (fall back to read-only if the
+        # kernel refuses write access up front; Part 3 reports that)
+        try:
+            mem_file = open(f"/proc/{pid}/mem", "r+b", buffering=0)
+        except PermissionError as e:
+            mem_write_error = e
+            mem_file = open(f"/proc/{pid}/mem", "rb", buffering=0)
+        code_bytes = os.pread(mem_file.fileno(), 64, target['start'])
         
         print(f"\n✓ Successfully read {len(code_bytes)} bytes of machine code!")
         print("First 64 bytes (hex):")
@@ -116,19 +151,19 @@ try:
         target = code_sections[0]
         print(f"Attempting write to: {hex(target['start'])}")
         
-        with open(f"/proc/{pid}/mem", "r+b") as mem:
-            mem.seek(target['start'])
-            # Try to write a NOP (0x90 in x86)
-            mem.write(b'\x90')
-            mem.flush()
+        if mem_write_error is not None:
+            raise mem_write_error
+        if mem_file is None:
+            mem_file = open(f"/proc/{pid}/mem", "r+b", buffering=0)
+        
+        # Try to write a NOP (0x90 in x86)
+        os.pwrite(mem_file.fileno(), b'\x90', target['start'])
         
         print("✓ Write operation completed without error!")
         write_success = True
         
         # Verify the write
-        with open(f"/proc/{pid}/mem", "rb") as mem:
-            mem.seek(target['start'])
-            verify = mem.read(1)
+        verify = os.pread(mem_file.fileno(), 1, target['start'])
         
         if verify == b'\x90':
             print("✓ VERIFIED: Memory was actually modified!")
@@ -140,6 +175,9 @@ except PermissionError as e:
 except Exception as e:
     print(f"✗ Failed: {e}")
     traceback.print_exc()
+finally:
+    if mem_file is not None:
+        mem_file.close()
 
 # ============================================================
 # PART 4: Alternative - mmap with PROT_EXEC
@@ -167,26 +205,18 @@ try:
     
     print("Creating executable memory region...")
     
-    # Create anonymous mmap with RWX permissions
+    # Carve a slot out of the RWX arena (mapped once at startup)
     # PROT_READ | PROT_WRITE | PROT_EXEC = 7
-    mem_size = 4096
-    
-    # Try using mmap directly
-    exec_mem = mmap.mmap(-1, mem_size, 
-                         prot=mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC,
-                         flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+    mem_size = 64
+    exec_mem, exec_mem_addr = jit_alloc(mem_size)
     
     print(f"✓ Allocated {mem_size} bytes of RWX memory")
     
     # Write the first shellcode
-    exec_mem.write(shellcode_return_42)
-    exec_mem.seek(0)
+    exec_mem[:len(shellcode_return_42)] = shellcode_return_42
     
     print(f"✓ Wrote shellcode: {shellcode_return_42.hex()}")
     
-    # Get the address of the mmap region
-    # This is tricky in Python...
-    exec_mem_addr = ctypes.addressof(ctypes.c_char.from_buffer(exec_mem))
     print(f"✓ Executable memory at: {hex(exec_mem_addr)}")
     
     # Create a function pointer to our shellcode
@@ -204,9 +234,7 @@ try:
     print("\n" + "-" * 50)
     print("Now modifying the code in-place...")
     
-    exec_mem.seek(0)
-    exec_mem.write(shellcode_return_1337)
-    exec_mem.seek(0)
+    exec_mem[:len(shellcode_return_1337)] = shellcode_return_1337
     
     print(f"✓ Overwrote with new shellcode: {shellcode_return_1337.hex()}")
     
@@ -218,7 +246,7 @@ try:
         print("🎉🎉 HOLY SHIT! Self-modifying code WORKS!")
         print("   We changed what a function does WHILE THE PROGRAM IS RUNNING!")
     
-    exec_mem.close()
+    exec_mem.release()
 
 except Exception as e:
     print(f"✗ Failed: {e}")
@@ -241,12 +269,10 @@ try:
         0xc3                            # ret
     ])
     
-    exec_mem2 = mmap.mmap(-1, 4096,
-                          prot=mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC,
-                          flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
-    
-    exec_mem2.write(bytes(base_code))
-    exec_mem2_addr = ctypes.addressof(ctypes.c_char.from_buffer(exec_mem2))
+    # Patch through the arena view: one 4-byte store into the mapping per
+    # iteration, no seek/write pair and no intermediate bytes object
+    code_view, exec_mem2_addr = jit_alloc(len(base_code))
+    code_view[:] = base_code
     
     FUNC_TYPE = CFUNCTYPE(c_int)
     dynamic_func = FUNC_TYPE(exec_mem2_addr)
@@ -256,17 +282,17 @@ try:
     print()
     
     results = []
+    call = dynamic_func
+    pack_into = struct.pack_into
+    append = results.append
     for i in range(10):
         # Call the function
-        result = dynamic_func()
-        results.append(result)
+        result = call()
+        append(result)
         
         # Now modify the code to return a different value
         new_value = (i + 1) * 100
-        new_bytes = struct.pack('<I', new_value)  # Little-endian 32-bit
-        
-        exec_mem2.seek(1)  # Position of the immediate value
-        exec_mem2.write(new_bytes)
+        pack_into('<I', code_view, 1, new_value)  # imm32 at offset 1
         
         print(f"  Iteration {i}: returned {result}, patched code to return {new_value}")
     
@@ -280,7 +306,7 @@ try:
     if results + [final_result] == expected:
         print("🎉🎉🎉 PERFECT! Code successfully modified itself during execution!")
     
-    exec_mem2.close()
+    code_view.release()
 
 except Exception as e:
     print(f"✗ Failed: {e}")
@@ -297,40 +323,29 @@ try:
     # Let's "JIT compile" simple math expressions
     # We'll generate x86-64 code that computes: a + b * c
     
-    def jit_compile_add_mul(a_val, b_val, c_val):
-        """Generate machine code for: return a + b * c"""
-        # x86-64 assembly:
-        # mov eax, a_val
-        # mov ecx, b_val
-        # mov edx, c_val
-        # imul ecx, edx      ; ecx = b * c
-        # add eax, ecx       ; eax = a + (b * c)
-        # ret
-        
-        code = bytearray()
-        
-        # mov eax, a_val (B8 + imm32)
-        code.extend([0xb8])
-        code.extend(struct.pack('<I', a_val & 0xFFFFFFFF))
-        
-        # mov ecx, b_val (B9 + imm32)
-        code.extend([0xb9])
-        code.extend(struct.pack('<I', b_val & 0xFFFFFFFF))
-        
-        # mov edx, c_val (BA + imm32)
-        code.extend([0xba])
-        code.extend(struct.pack('<I', c_val & 0xFFFFFFFF))
-        
-        # imul ecx, edx (0F AF CA)
-        code.extend([0x0f, 0xaf, 0xca])
-        
-        # add eax, ecx (01 C8)
-        code.extend([0x01, 0xc8])
-        
-        # ret (C3)
-        code.extend([0xc3])
-        
-        return bytes(code)
+    # x86-64 assembly:
+    # mov eax, a_val     (B8 + imm32)
+    # mov ecx, b_val     (B9 + imm32)
+    # mov edx, c_val     (BA + imm32)
+    # imul ecx, edx      (0F AF CA)  ; ecx = b * c
+    # add eax, ecx       (01 C8)     ; eax = a + (b * c)
+    # ret                (C3)
+    # Encoded once; each compile only patches the three imm32 slots.
+    ADD_MUL_TEMPLATE = bytes.fromhex(
+        'b800000000'   # +0:  mov eax, imm32 (a at +1)
+        'b900000000'   # +5:  mov ecx, imm32 (b at +6)
+        'ba00000000'   # +10: mov edx, imm32 (c at +11)
+        '0fafca'       # +15: imul ecx, edx
+        '01c8'         # +18: add eax, ecx
+        'c3'           # +20: ret
+    )
+    ADD_MUL_IMM = struct.Struct('<i')  # imm32 slot (signed: no masking needed)
+    ADD_MUL_OFFSETS = (1, 6, 11)
+    
+    def jit_compile_add_mul(code_buf, a_val, b_val, c_val):
+        """Specialize the ADD_MUL_TEMPLATE already in code_buf to: return a + b * c"""
+        for off, val in zip(ADD_MUL_OFFSETS, (a_val, b_val, c_val)):
+            ADD_MUL_IMM.pack_into(code_buf, off, val)
     
     # Test cases
     test_cases = [
@@ -340,34 +355,41 @@ try:
         (0, 7, 8),      # 0 + 7*8 = 56
     ]
     
-    exec_mem3 = mmap.mmap(-1, 4096,
-                          prot=mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC,
-                          flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+    # AoS -> SoA once at setup: one contiguous int32 array per operand,
+    # shared by every kernel below that takes array arguments
+    n_cases = len(test_cases)
+    a_arr, b_arr, c_arr = ((ctypes.c_int32 * n_cases)(*column) for column in zip(*test_cases))
+    expected_results = [a + b * c for a, b, c in test_cases]
+    
+    # One arena slot holds every PART 6 function at fixed offsets
+    code_view, jit_func_addr = jit_alloc(512)
     
     FUNC_TYPE = CFUNCTYPE(c_int)
     
+    # Lay the template down once; each compile then patches the immediates
+    # straight into the executable page (no intermediate bytes, no write())
+    code_view[:len(ADD_MUL_TEMPLATE)] = ADD_MUL_TEMPLATE
+    machine_code = code_view[:len(ADD_MUL_TEMPLATE)]
+    
+    # The slot never moves, so one function pointer serves every compile
+    jit_func = FUNC_TYPE(jit_func_addr)
+    
     print("JIT-compiling and executing math expressions:")
     print()
     
     all_passed = True
     for a, b, c in test_cases:
-        # Generate machine code
-        machine_code = jit_compile_add_mul(a, b, c)
-        
-        # Write to executable memory
-        exec_mem3.seek(0)
-        exec_mem3.write(machine_code)
+        # Generate machine code in place
+        jit_compile_add_mul(code_view, a, b, c)
         
         # Execute
-        jit_func_addr = ctypes.addressof(ctypes.c_char.from_buffer(exec_mem3))
-        jit_func = FUNC_TYPE(jit_func_addr)
-        
         result = jit_func()
         expected = a + b * c
         
         status = "✓" if result == expected else "✗"
         print(f"  {status} {a} + {b} * {c} = {result} (expected: {expected})")
-        print(f"    Machine code: {machine_code.hex()}")
+        if VERBOSE:
+            print(f"    Machine code: {machine_code.hex()}")
         
         if result != expected:
             all_passed = False
@@ -376,7 +398,130 @@ try:
         print("\n🎉🎉🎉🎉 WE BUILT A MINI JIT COMPILER!")
         print("   Python generated x86-64 machine code and executed it!")
     
-    exec_mem3.close()
+    # Unroll every case into one straight-line function that stores each
+    # result into out[i] (rdi): one ctypes call instead of one per case
+    print("\nStraight-line compile: every case in one function, results to out[] (rdi):")
+    ADD_MUL_STORE = struct.Struct('<BiBiBi5s2sI')  # the template plus mov [rdi+disp32], eax
+    
+    def jit_compile_add_mul_sequence(cases):
+        """Emit void f(int *out) computing out[i] = a + b * c for each case"""
+        code = bytearray(ADD_MUL_STORE.size * len(cases) + 1)
+        for i, (a_val, b_val, c_val) in enumerate(cases):
+            ADD_MUL_STORE.pack_into(
+                code, i * ADD_MUL_STORE.size,
+                0xb8, a_val,                # mov eax, a
+                0xb9, b_val,                # mov ecx, b
+                0xba, c_val,                # mov edx, c
+                b'\x0f\xaf\xca\x01\xc8',   # imul ecx, edx; add eax, ecx
+                b'\x89\x87', i * 4)         # mov [rdi+disp32], eax
+        code[-1] = 0xc3                     # ret
+        return code
+    
+    sequence_code = jit_compile_add_mul_sequence(test_cases)
+    sequence_offset = 256
+    code_view[sequence_offset:sequence_offset + len(sequence_code)] = sequence_code
+    jit_add_mul_sequence = CFUNCTYPE(None, ctypes.POINTER(ctypes.c_int32))(
+        jit_func_addr + sequence_offset)
+    sequence_out = (ctypes.c_int32 * n_cases)()
+    jit_add_mul_sequence(sequence_out)
+    status = "✓" if list(sequence_out) == expected_results else "✗"
+    print(f"    Machine code: {len(sequence_code)} bytes for {n_cases} cases")
+    print(f"  {status} Results: {list(sequence_out)} (expected: {expected_results})")
+    
+    # Compile once, parameterize at the call site: a, b, c arrive in the
+    # System V argument registers, so new inputs need no new code
+    print("\nCompile once, pass a, b, c as arguments (edi, esi, edx):")
+    add_mul_args_code = bytes.fromhex(
+        '89f8'     # mov eax, edi
+        '0faff2'   # imul esi, edx   ; esi = b * c
+        '01f0'     # add eax, esi    ; eax = a + (b * c)
+        'c3'       # ret
+    )
+    args_offset = 64
+    code_view[args_offset:args_offset + len(add_mul_args_code)] = add_mul_args_code
+    jit_add_mul = CFUNCTYPE(c_int, c_int, c_int, c_int)(jit_func_addr + args_offset)
+    print(f"    Machine code: {add_mul_args_code.hex()}")
+    
+    args_passed = True
+    for a, b, c in test_cases:
+        result = jit_add_mul(a, b, c)
+        expected = a + b * c
+        status = "✓" if result == expected else "✗"
+        print(f"  {status} f({a}, {b}, {c}) = {result} (expected: {expected})")
+        if result != expected:
+            args_passed = False
+    
+    if args_passed:
+        print("✓ One compiled function served every input")
+    
+    # Batch kernel: out[i] = a[i] + b[i] * c[i] over three SoA int32 arrays
+    # in ONE native call, 4 lanes at a time with SSE4.1 pmulld/paddd and a
+    # scalar tail. void f(a=rdi, b=rsi, c=rdx, out=rcx, n=r8d, n_vec=r9d);
+    # the caller passes n_vec = 0 when the CPU lacks SSE4.1.
+    print("\nBatch kernel: all inputs in one native call (SoA arrays, SSE4.1):")
+    add_mul_batch_code = bytes.fromhex(
+        '31c0'          # 00: xor eax, eax              ; i = 0
+        '4439c8'        # 02: vec: cmp eax, r9d
+        '7d22'          # 05: jge scalar
+        'f30f6f0486'    # 07: movdqu xmm0, [rsi+rax*4]  ; b[i..i+3]
+        'f30f6f0c82'    # 0c: movdqu xmm1, [rdx+rax*4]  ; c[i..i+3]
+        '660f3840c1'    # 11: pmulld xmm0, xmm1
+        'f30f6f0c87'    # 16: movdqu xmm1, [rdi+rax*4]  ; a[i..i+3]
+        '660ffec1'      # 1b: paddd xmm0, xmm1
+        'f30f7f0481'    # 1f: movdqu [rcx+rax*4], xmm0
+        '83c004'        # 24: add eax, 4
+        'ebd9'          # 27: jmp vec
+        '4439c0'        # 29: scalar: cmp eax, r8d
+        '7d15'          # 2c: jge done
+        '448b1486'      # 2e: mov r10d, [rsi+rax*4]
+        '440faf1482'    # 32: imul r10d, [rdx+rax*4]
+        '44031487'      # 37: add r10d, [rdi+rax*4]
+        '44891481'      # 3b: mov [rcx+rax*4], r10d
+        'ffc0'          # 3f: inc eax
+        'ebe6'          # 41: jmp scalar
+        'c3'            # 43: done: ret
+    )
+    batch_offset = 128
+    code_view[batch_offset:batch_offset + len(add_mul_batch_code)] = add_mul_batch_code
+    int_ptr = ctypes.POINTER(ctypes.c_int32)
+    jit_add_mul_batch = CFUNCTYPE(None, int_ptr, int_ptr, int_ptr, int_ptr, c_int, c_int)(
+        jit_func_addr + batch_offset)
+    
+    with open('/proc/cpuinfo') as f:
+        has_sse41 = 'sse4_1' in f.read().split()
+    
+    def run_batch(a_arr, b_arr, c_arr):
+        n = len(a_arr)
+        out = (ctypes.c_int32 * n)()
+        jit_add_mul_batch(a_arr, b_arr, c_arr, out, n, n & ~3 if has_sse41 else 0)
+        return out
+    
+    out = run_batch(a_arr, b_arr, c_arr)
+    print(f"    SSE4.1: {'yes' if has_sse41 else 'no (scalar path only)'}")
+    print(f"    Results: {list(out)} (expected: {expected_results})")
+    
+    # A larger batch exercises both the SIMD body and the scalar tail
+    n_big = 100003
+    big_a = (ctypes.c_int32 * n_big)(*range(n_big))
+    big_b = (ctypes.c_int32 * n_big)(*[i % 1000 for i in range(n_big)])
+    big_c = (ctypes.c_int32 * n_big)(*[i % 7 for i in range(n_big)])
+    start = time.perf_counter()
+    big_out = run_batch(big_a, big_b, big_c)
+    batch_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for i in range(n_big):
+        jit_add_mul(big_a[i], big_b[i], big_c[i])
+    per_call_time = time.perf_counter() - start
+    
+    batch_ok = all(big_out[i] == big_a[i] + big_b[i] * big_c[i] for i in range(n_big))
+    print(f"  {'✓' if batch_ok else '✗'} {n_big} triples computed in one call")
+    print(f"    One batch call: {batch_time * 1000:.3f} ms, "
+          f"{n_big} single calls: {per_call_time * 1000:.3f} ms "
+          f"({per_call_time / batch_time:.0f}x)")
+    
+    machine_code.release()
+    code_view.release()
 
 except Exception as e:
     print(f"✗ Failed: {e}")
@@ -28,6 +28,7 @@ print(f"Read back:      {read_back.hex()}")
 print(f"Match: {code == read_back}")
 
 # Execute and verify return value
+# The mapping never moves, so its address is taken once and reused below
 mem_addr = ctypes.addressof(ctypes.c_char.from_buffer(mem))
 func = ctypes.CFUNCTYPE(ctypes.c_uint32)(mem_addr)
 result = func()
@@ -41,7 +42,9 @@ import os
 pid = os.getpid()
 with open(f"/proc/{pid}/maps") as f:
     for line in f:
-        if 'rwxp' in line:  # Find RWX regions
+        addr_range, perms = line.split(None, 2)[:2]
+        start, end = (int(x, 16) for x in addr_range.split('-'))
+        if perms == 'rwxp' and start <= mem_addr < end:  # Our RWX region
             print(f"\nRWX memory region found in /proc/{pid}/maps:")
             print(f"  {line.strip()}")
             break
@@ -12,13 +12,150 @@ This script will:
 """
 
 import ctypes
+import ctypes.util
+import hashlib
+import mmap
 import os
+import platform
+import struct
 import subprocess
 import sys
-import tempfile
 import time
 from pathlib import Path
 
+TCC_OUTPUT_MEMORY = 1
+TCC_RELOCATE_AUTO = ctypes.c_void_p(1)
+
+def compile_with_libtcc(c_source):
+    """Compile C source straight into executable memory with libtcc.
+    
+    Returns (tcc_state, libtcc) or None if libtcc isn't installed. The state
+    owns the generated code and must stay alive while its functions are used.
+    """
+    path = ctypes.util.find_library("tcc")
+    if path is None:
+        return None
+    libtcc = ctypes.CDLL(path)
+    libtcc.tcc_new.restype = ctypes.c_void_p
+    libtcc.tcc_set_output_type.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    libtcc.tcc_compile_string.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    libtcc.tcc_get_symbol.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    libtcc.tcc_get_symbol.restype = ctypes.c_void_p
+    
+    state = libtcc.tcc_new()
+    libtcc.tcc_set_output_type(state, TCC_OUTPUT_MEMORY)
+    if libtcc.tcc_compile_string(state, c_source.encode()) == -1:
+        raise RuntimeError("libtcc failed to compile the generated source")
+    # tcc < 0.9.28 takes (state, TCC_RELOCATE_AUTO); newer takes (state) and
+    # ignores the extra register argument
+    if libtcc.tcc_relocate(ctypes.c_void_p(state), TCC_RELOCATE_AUTO) < 0:
+        raise RuntimeError("libtcc failed to relocate the generated code")
+    return state, libtcc
+
+ELF_HEADER = struct.Struct('<16sHHIQQQIHHHHHH')
+ELF_SECTION = struct.Struct('<IIQQQQIIQQ')
+ELF_SYMBOL = struct.Struct('<IBBHQQ')
+ELF_RELA = struct.Struct('<QQq')
+SHT_SYMTAB, SHT_RELA, SHT_NOBITS, SHF_ALLOC = 2, 4, 8, 0x2
+SHN_UNDEF, SHN_ABS = 0, 0xfff1
+R_X86_64_64, R_X86_64_PC32, R_X86_64_PLT32 = 1, 2, 4
+
+def host_cpu_identity():
+    """Describe what -march=native resolves to on this host.
+    
+    Build caches key on this so a binary built for one CPU is never loaded on
+    another (a shared ~/.cache would otherwise risk SIGILL). GCC's resolved
+    target options are preferred; the kernel's CPU flags are the fallback.
+    """
+    parts = [platform.machine()]
+    try:
+        result = subprocess.run(["gcc", "-march=native", "-Q", "--help=target"],
+                                capture_output=True, text=True)
+        parts.append(result.stdout)
+    except OSError:
+        pass
+    try:
+        with open("/proc/cpuinfo") as f:
+            parts.extend(line for line in f if line.startswith(("flags", "model name")))
+    except OSError:
+        pass
+    return "\0".join(parts)
+
+def load_elf_object(obj_path):
+    """Copy the allocated sections of an x86-64 ELF .o into an RWX mapping.
+    
+    A minimal static linker: lays out .text/.rodata/.data/.bss, applies the
+    RELA relocations a -fPIC -fno-plt object needs, and returns
+    (mapping, {symbol: address}). No ld.so, no PLT/GOT. The mapping owns the
+    code and must stay alive while the functions are used.
+    """
+    data = Path(obj_path).read_bytes()
+    header = ELF_HEADER.unpack_from(data)
+    if header[0][:4] != b'\x7fELF' or header[2] != 62:  # EM_X86_64
+        raise RuntimeError(f"{obj_path} is not an x86-64 ELF object")
+    shoff, shnum = header[6], header[12]
+    sections = [ELF_SECTION.unpack_from(data, shoff + i * ELF_SECTION.size)
+                for i in range(shnum)]
+    
+    # Lay out every allocated section back to back, honouring alignment
+    layout = {}
+    size = 0
+    for index, (_, sh_type, flags, _, _, sh_size, _, _, align, _) in enumerate(sections):
+        if flags & SHF_ALLOC and sh_size:
+            size = -(-size // max(align, 1)) * max(align, 1)
+            layout[index] = size
+            size += sh_size
+    
+    mem = mmap.mmap(-1, max(size, 1),
+                    prot=mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC,
+                    flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
+    base = ctypes.addressof(ctypes.c_char.from_buffer(mem))
+    for index, offset in layout.items():
+        _, sh_type, _, _, sh_offset, sh_size = sections[index][:6]
+        if sh_type != SHT_NOBITS:  # .bss stays zero-filled
+            mem[offset:offset + sh_size] = data[sh_offset:sh_offset + sh_size]
+    
+    def read_symbols(symtab_index):
+        _, _, _, _, offset, sh_size, strtab_index = sections[symtab_index][:7]
+        strtab_offset = sections[strtab_index][4]
+        symbols = []
+        for pos in range(offset, offset + sh_size, ELF_SYMBOL.size):
+            name, _, _, shndx, value, _ = ELF_SYMBOL.unpack_from(data, pos)
+            end = data.index(b'\0', strtab_offset + name)
+            symbols.append((data[strtab_offset + name:end].decode(), shndx, value))
+        return symbols
+    
+    def resolve(name, shndx, value):
+        if shndx == SHN_ABS:
+            return value
+        if shndx not in layout:
+            raise RuntimeError(f"unresolved symbol {name!r} in {obj_path}")
+        return base + layout[shndx] + value
+    
+    symtab_index = next(i for i, sec in enumerate(sections) if sec[1] == SHT_SYMTAB)
+    symbols = read_symbols(symtab_index)
+    
+    # Patch relocations in place, in the loaded copies of their target sections
+    for _, sh_type, _, _, offset, sh_size, _, info, _, _ in sections:
+        if sh_type != SHT_RELA or info not in layout:
+            continue
+        for pos in range(offset, offset + sh_size, ELF_RELA.size):
+            r_offset, r_info, addend = ELF_RELA.unpack_from(data, pos)
+            target = resolve(*symbols[r_info >> 32]) + addend
+            where = layout[info] + r_offset
+            r_type = r_info & 0xffffffff
+            if r_type == R_X86_64_64:
+                struct.pack_into('<Q', mem, where, target)
+            elif r_type in (R_X86_64_PC32, R_X86_64_PLT32):
+                struct.pack_into('<i', mem, where, target - (base + where))
+            else:
+                raise RuntimeError(f"unsupported relocation type {r_type} in {obj_path}")
+    
+    exports = {name: resolve(name, shndx, value)
+               for name, shndx, value in symbols
+               if name and shndx in layout}
+    return mem, exports
+
 def main():
     print("=" * 80)
     print("EXPERIMENT: Runtime C Code Generation and Compilation")
@@ -32,13 +169,16 @@ def main():
 #include <math.h>
 #include <time.h>
 
+// Built with -fvisibility=hidden: only these entry points are exported
+#define EXPORT __attribute__((visibility("default")))
+
 // A simple function that adds two numbers
-int add(int a, int b) {
+EXPORT int add(int a, int b) {
     return a + b;
 }
 
 // A more complex function that calculates factorial
-long long factorial(int n) {
+EXPORT long long factorial(int n) {
     if (n <= 1) return 1;
     long long result = 1;
     for (int i = 2; i <= n; i++) {
@@ -48,23 +188,29 @@ long long factorial(int n) {
 }
 
 // A function that does something "impossible" - direct memory manipulation
-unsigned long get_stack_address() {
+EXPORT unsigned long get_stack_address() {
     int local_var;
     return (unsigned long)&local_var;
 }
 
 // A function that uses CPU timestamp counter (very low-level)
-unsigned long long get_cpu_cycles() {
+EXPORT unsigned long long get_cpu_cycles() {
     unsigned int lo, hi;
     __asm__ __volatile__ ("rdtsc" : "=a" (lo), "=d" (hi));
     return ((unsigned long long)hi << 32) | lo;
 }
 
 // A computationally intensive function to show real C performance
-double compute_pi(int iterations) {
+// Terms are paired (+1/(4k+1) - 1/(4k+3)) so there is no parity branch
+// and the loop vectorizes into packed divides/adds
+EXPORT double compute_pi(int iterations) {
     double pi = 0.0;
-    for (int i = 0; i < iterations; i++) {
-        pi += (i % 2 == 0 ? 1.0 : -1.0) / (2 * i + 1);
+    int pairs = iterations / 2;
+    for (int k = 0; k < pairs; k++) {
+        pi += 1.0 / (4.0 * k + 1.0) - 1.0 / (4.0 * k + 3.0);
+    }
+    if (iterations % 2) {
+        pi += 1.0 / (2.0 * (iterations - 1) + 1.0);
     }
     return pi * 4.0;
 }
@@ -76,14 +222,36 @@ double compute_pi(int iterations) {
     print("-" * 80)
     print()
     
-    # Step 2: Create temporary directory and write C file
-    print("[STEP 2] Writing C source to temporary file...")
-    temp_dir = tempfile.mkdtemp(prefix="runtime_c_")
-    c_file = Path(temp_dir) / "generated.c"
-    so_file = Path(temp_dir) / "generated.so"
+    # Step 2: Write C file into the build cache
+    print("[STEP 2] Writing C source to the build cache...")
+    compile_flags = [
+        "-shared",           # Create shared library
+        "-fPIC",            # Position Independent Code (required for -shared)
+        "-O3",              # Optimization level 3 (enables auto-vectorization)
+        "-march=native",    # Use every ISA extension of this CPU (AVX2, FMA, ...)
+        "-ffast-math",      # Allow reassociation so FP reductions vectorize
+        "-funroll-loops",   # Unroll hot loops
+        "-fvisibility=hidden",  # Direct intra-library calls, no PLT/interposition
+    ]
     
-    with open(c_file, 'w') as f:
+    # The .so is keyed by source + flags + host CPU, so an unchanged kernel
+    # is loaded straight from disk on later runs instead of re-invoking GCC,
+    # and a -march=native build is never reused on a different CPU
+    cpu_identity = host_cpu_identity()
+    cache_key = hashlib.blake2b(
+        "\0".join([c_source, cpu_identity] + compile_flags).encode(), digest_size=16
+    ).hexdigest()
+    cache_dir = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "runtime_c"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    c_file = cache_dir / f"{cache_key}.c"
+    so_file = cache_dir / f"{cache_key}.so"
+    
+    # Written privately and renamed like the .so: gcc in a concurrent run
+    # may be reading this file, and must never see it truncated
+    tmp_c_file = c_file.with_name(f"{c_file.name}.{os.getpid()}.tmp")
+    with open(tmp_c_file, 'w') as f:
         f.write(c_source)
+    os.replace(tmp_c_file, c_file)
     
     print(f"C source written to: {c_file}")
     print(f"Will compile to: {so_file}")
@@ -91,35 +259,41 @@ double compute_pi(int iterations) {
     
     # Step 3: Compile the C code into a shared library
     print("[STEP 3] Compiling C code with GCC...")
-    compile_cmd = [
-        "gcc",
-        "-shared",           # Create shared library
-        "-fPIC",            # Position Independent Code
-        "-O2",              # Optimization level 2
-        "-o", str(so_file), # Output file
-        str(c_file)         # Input file
-    ]
-    
-    print(f"Compile command: {' '.join(compile_cmd)}")
-    
-    start_compile = time.time()
-    result = subprocess.run(
-        compile_cmd,
-        capture_output=True,
-        text=True
-    )
-    compile_time = time.time() - start_compile
-    
-    print(f"Compilation took: {compile_time:.4f} seconds")
-    
-    if result.returncode != 0:
-        print("COMPILATION FAILED!")
-        print("STDOUT:", result.stdout)
-        print("STDERR:", result.stderr)
-        sys.exit(1)
-    
-    print("✓ Compilation successful!")
-    print()
+    if so_file.exists():
+        print(f"✓ Cache hit for {cache_key}, skipping compilation")
+        print()
+    else:
+        # Build to a private name and rename, so a concurrent run never
+        # loads a half-written library
+        tmp_so_file = so_file.with_name(f"{so_file.name}.{os.getpid()}.tmp")
+        compile_cmd = [
+            "gcc",
+            *compile_flags,
+            "-o", str(tmp_so_file), # Output file
+            str(c_file)         # Input file
+        ]
+        
+        print(f"Compile command: {' '.join(compile_cmd)}")
+        
+        start_compile = time.time()
+        result = subprocess.run(
+            compile_cmd,
+            capture_output=True,
+            text=True
+        )
+        compile_time = time.time() - start_compile
+        
+        print(f"Compilation took: {compile_time:.4f} seconds")
+        
+        if result.returncode != 0:
+            print("COMPILATION FAILED!")
+            print("STDOUT:", result.stdout)
+            print("STDERR:", result.stderr)
+            sys.exit(1)
+        
+        os.replace(tmp_so_file, so_file)
+        print("✓ Compilation successful!")
+        print()
     
     # Step 4: Verify the shared library was created
     print("[STEP 4] Verifying compiled library...")
@@ -229,7 +403,10 @@ double compute_pi(int iterations) {
     # Compare with pure Python
     print("\nComparing with pure Python implementation...")
     start = time.time()
-    pi_python = sum((1.0 if i % 2 == 0 else -1.0) / (2 * i + 1) for i in range(10000000)) * 4.0
+    # Split the series by sign into two strided ranges: no parity branch and
+    # no per-term index arithmetic left in the interpreted loop
+    pi_python = (sum(1.0 / d for d in range(1, 20000000, 4))
+                 - sum(1.0 / d for d in range(3, 20000000, 4))) * 4.0
     python_time = time.time() - start
     
     print(f"Result: {pi_python:.10f}")
@@ -237,6 +414,82 @@ double compute_pi(int iterations) {
     print(f"C is {python_time / c_time:.2f}x faster!")
     print("✓ C code is significantly faster!")
     
+    # Step 8: Same source, compiled in-process (no fork/exec, no .so, no dlopen)
+    print("\n[STEP 8] Compiling the same source in memory with libtcc...")
+    start_tcc = time.time()
+    try:
+        tcc = compile_with_libtcc(c_source)
+    except (OSError, RuntimeError) as e:
+        tcc = None
+        print(f"✗ libtcc compile failed: {e}")
+    tcc_compile_time = time.time() - start_tcc
+    
+    if tcc is None:
+        print("libtcc not available, skipping (install tcc / libtcc-dev)")
+    else:
+        tcc_state, libtcc = tcc
+        print(f"In-memory compilation took: {tcc_compile_time:.4f} seconds")
+        tcc_add = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_int)(
+            libtcc.tcc_get_symbol(tcc_state, b"add"))
+        tcc_pi = ctypes.CFUNCTYPE(ctypes.c_double, ctypes.c_int)(
+            libtcc.tcc_get_symbol(tcc_state, b"compute_pi"))
+        assert tcc_add(42, 58) == 100, "libtcc addition failed!"
+        start = time.time()
+        tcc_pi_result = tcc_pi(10000000)
+        tcc_time = time.time() - start
+        print(f"add(42, 58) = {tcc_add(42, 58)}")
+        print(f"compute_pi(10000000) = {tcc_pi_result:.10f} in {tcc_time:.6f} seconds "
+              f"(GCC build: {c_time:.6f} seconds)")
+        print("✓ Compiled and ran C without touching the filesystem!")
+    
+    # Step 9: Same source as a plain object file, linked into memory by hand
+    print("\n[STEP 9] Loading a relocatable object straight into executable memory...")
+    object_flags = [
+        "-c",                # Relocatable object, no linking
+        "-fPIC",             # RIP-relative data references only
+        "-fno-plt",          # No PLT stubs for the loader to synthesize
+        "-O3",
+        "-march=native",
+        "-ffast-math",
+        "-funroll-loops",
+        "-fno-stack-protector",          # No __stack_chk_fail import
+        "-fno-asynchronous-unwind-tables",  # No .eh_frame to load
+    ]
+    object_key = hashlib.blake2b(
+        "\0".join([c_source, cpu_identity] + object_flags).encode(), digest_size=16
+    ).hexdigest()
+    obj_file = cache_dir / f"{object_key}.o"
+    if obj_file.exists():
+        print(f"✓ Cache hit for {object_key}, skipping compilation")
+    else:
+        tmp_obj_file = obj_file.with_name(f"{obj_file.name}.{os.getpid()}.tmp")
+        result = subprocess.run(
+            ["gcc", *object_flags, "-x", "c", "-o", str(tmp_obj_file), str(c_file)],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            print("COMPILATION FAILED!")
+            print("STDERR:", result.stderr)
+            sys.exit(1)
+        os.replace(tmp_obj_file, obj_file)
+    
+    start_load = time.perf_counter()
+    obj_mem, obj_symbols = load_elf_object(obj_file)
+    obj_pi = ctypes.CFUNCTYPE(ctypes.c_double, ctypes.c_int)(obj_symbols["compute_pi"])
+    load_time = time.perf_counter() - start_load
+    
+    obj_add = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_int, ctypes.c_int)(obj_symbols["add"])
+    assert obj_add(42, 58) == 100, "object loader addition failed!"
+    start = time.time()
+    obj_pi_result = obj_pi(10000000)
+    obj_time = time.time() - start
+    assert abs(obj_pi_result - pi_result) < 1e-9, "object loader compute_pi mismatch!"
+    print(f"Loaded {len(obj_symbols)} symbols into {len(obj_mem)} bytes of RWX memory")
+    print(f"Object load + relocate: {load_time * 1e6:.1f} µs")
+    print(f"compute_pi(10000000) = {obj_pi_result:.10f} in {obj_time:.6f} seconds")
+    print("✓ Ran compiled C without the dynamic linker!")
+    
     print("\n" + "=" * 80)
     print("EXPERIMENT COMPLETE!")
     print("=" * 80)
@@ -249,9 +502,10 @@ double compute_pi(int iterations) {
     print("✓ Verified correct execution")
     print("✓ Demonstrated low-level CPU access")
     print("✓ Showed performance advantage of compiled code")
+    print("✓ Loaded a relocatable object without the dynamic linker")
     print()
-    print(f"Temporary files location: {temp_dir}")
-    print("(Files will be cleaned up on next reboot)")
+    print(f"Build cache location: {cache_dir}")
+    print("(Delete it to force a rebuild)")
     print()
     print("CONCLUSION: YES, Python can generate, compile, and execute C code at runtime!")
     print("This opens up possibilities for:")
@@ -17,6 +17,7 @@ from PIL import Image
 import ctypes
 import mmap
 import struct
+from itertools import compress
 
 # Evidence directory
 EVIDENCE_DIR = "/home/ubuntu/unknown-unknown-experiments/experiments/004-executable-image/evidence"
@@ -53,6 +54,9 @@ def create_hello_world_shellcode():
     
     return shellcode
 
+# Translation table mapping a green value of 255 to 1 and everything else to 0
+VALID_MARKER = bytes(255) + b'\x01'
+
 def encode_code_to_image(code_bytes, output_path):
     """
     Encode machine code into a PNG image
@@ -77,16 +81,12 @@ def encode_code_to_image(code_bytes, output_path):
     print(f"Image dimensions: {width}x{height} pixels")
     print()
     
-    # Create image
-    img = Image.new('RGB', (width, height), color=(0, 0, 0))
-    pixels = img.load()
-    
-    # Encode code bytes into pixels
-    for i, byte in enumerate(code_bytes):
-        x = i % width
-        y = i // width
-        # Store byte in red channel, mark green channel with 255 to indicate valid data
-        pixels[x, y] = (byte, 255, 0)
+    # Build the interleaved RGB buffer with strided slice writes:
+    # byte in red channel, green channel 255 to mark valid data
+    pixel_data = bytearray(width * height * 3)
+    pixel_data[0:code_length * 3:3] = code_bytes
+    pixel_data[1:code_length * 3:3] = b'\xff' * code_length
+    img = Image.frombytes('RGB', (width, height), bytes(pixel_data))
     
     # Save image
     img.save(output_path)
@@ -108,23 +108,18 @@ def decode_code_from_image(image_path, code_length):
     print()
     
     img = Image.open(image_path)
-    pixels = img.load()
     width, height = img.size
     
     print(f"Image dimensions: {width}x{height} pixels")
     print()
     
     # Extract code bytes from pixels
-    code_bytes = bytearray()
-    for i in range(code_length):
-        x = i % width
-        y = i // width
-        r, g, b = pixels[x, y]
-        # Only extract if green channel is 255 (valid data marker)
-        if g == 255:
-            code_bytes.append(r)
-    
-    code_bytes = bytes(code_bytes)
+    pixel_data = img.convert('RGB').tobytes()
+    red = pixel_data[0:code_length * 3:3]
+    green = pixel_data[1:code_length * 3:3]
+    # Only extract if green channel is 255 (valid data marker)
+    valid = green.translate(VALID_MARKER)
+    code_bytes = bytes(compress(red, valid))
     print(f"Extracted {len(code_bytes)} bytes")
     print(f"Code (hex): {code_bytes.hex()}")
     print()
@@ -13,18 +13,46 @@ just data, but here we're treating pixel values as executable instructions.
 
 import os
 import sys
+import platform
+import functools
 from PIL import Image
 import ctypes
 import mmap
 import struct
 
+# Optional: with keystone-engine installed, shellcode is assembled from text
+# instead of hand-encoded bytes
+try:
+    from keystone import Ks, KS_ARCH_X86, KS_MODE_64
+except ImportError:
+    Ks = None
+
+# The shellcode below is x86-64 Linux syscalls; checked once at import
+SUPPORTED_PLATFORM = sys.platform == "linux" and platform.machine() == "x86_64"
+
 # Evidence directory
 EVIDENCE_DIR = "/home/ubuntu/unknown-unknown-experiments/experiments/004-executable-image/evidence"
 os.makedirs(EVIDENCE_DIR, exist_ok=True)
 
-def create_hello_world_shellcode():
+HELLO_WORLD_ASM = """
+    mov rax, 1
+    mov rdi, 1
+    lea rsi, [rip + msg]
+    mov rdx, {length}
+    syscall
+    ret
+msg:
+"""
+
+@functools.lru_cache(maxsize=None)
+def assemble(source):
+    """Assemble x86-64 source with keystone; results are cached per source"""
+    encoding, _ = Ks(KS_ARCH_X86, KS_MODE_64).asm(source)
+    return bytes(encoding)
+
+def _assemble_hello_world():
     """
-    Create x86-64 shellcode that writes "Hello from image!" to stdout
+    Assemble x86-64 shellcode that writes "Hello from image!" to stdout
     
     This is raw machine code that:
     1. Sets up a write() syscall
@@ -32,31 +60,48 @@ def create_hello_world_shellcode():
     3. Returns cleanly (no exit!)
     """
     # x86-64 Linux shellcode to write "Hello from image!\n" to stdout
-    shellcode = bytes([
-        # write(1, message, 18)
+    message = b"Hello from image!\n"
+    
+    # The assembler resolves the rip-relative msg label itself; the message
+    # bytes follow the code, right where the label points
+    if Ks is not None:
+        return assemble(HELLO_WORLD_ASM.format(length=len(message))) + message
+    
+    # write(1, message, len(message))
+    prologue = bytearray([
         0x48, 0xc7, 0xc0, 0x01, 0x00, 0x00, 0x00,  # mov rax, 1 (sys_write)
         0x48, 0xc7, 0xc7, 0x01, 0x00, 0x00, 0x00,  # mov rdi, 1 (stdout)
-        0x48, 0x8d, 0x35, 0x0a, 0x00, 0x00, 0x00,  # lea rsi, [rip+10] (message)
-        0x48, 0xc7, 0xc2, 0x12, 0x00, 0x00, 0x00,  # mov rdx, 18 (length)
+        0x48, 0x8d, 0x35, 0x00, 0x00, 0x00, 0x00,  # lea rsi, [rip+disp32] (message)
+    ])
+    lea_imm_off = len(prologue) - 4
+    
+    body = bytearray([
+        0x48, 0xc7, 0xc2, 0x00, 0x00, 0x00, 0x00,  # mov rdx, len(message)
         0x0f, 0x05,                                # syscall
         
         # return (instead of exit)
         0xc3,                                      # ret
-        
-        # Message string
-        0x48, 0x65, 0x6c, 0x6c, 0x6f, 0x20, 0x66, 0x72,  # "Hello fr"
-        0x6f, 0x6d, 0x20, 0x69, 0x6d, 0x61, 0x67, 0x65,  # "om image"
-        0x21, 0x0a                                        # "!\n"
     ])
+    struct.pack_into('<i', body, 3, len(message))
     
-    return shellcode
+    # rip points just past the lea, so the message sits len(body) bytes ahead
+    struct.pack_into('<i', prologue, lea_imm_off, len(body))
+    
+    return bytes(prologue + body + message)
+
+# Assembled once at import; every caller shares the same immutable bytes
+SHELLCODE = _assemble_hello_world()
+
+def create_hello_world_shellcode():
+    """Return the preassembled "Hello from image!" shellcode"""
+    return SHELLCODE
 
 def encode_code_to_image(code_bytes, output_path):
     """
     Encode machine code into a PNG image
     
-    Each byte of code becomes one pixel value in the red channel.
-    We use a simple encoding: R=code_byte, G=0, B=0
+    Code bytes are packed three per pixel (R, G, B), row-major, with the
+    last pixels zero-padded. The pixel buffer is handed to PIL in one call.
     """
     print("=" * 60)
     print("STEP 1: ENCODING MACHINE CODE INTO IMAGE")
@@ -69,22 +114,16 @@ def encode_code_to_image(code_bytes, output_path):
     print()
     
     # Calculate image dimensions (make it roughly square)
-    width = int(code_length ** 0.5) + 1
-    height = (code_length // width) + 1
+    pixel_count = -(-code_length // 3)
+    width = int(pixel_count ** 0.5) + 1
+    height = -(-pixel_count // width)
     
     print(f"Image dimensions: {width}x{height} pixels")
     print()
     
-    # Create image
-    img = Image.new('RGB', (width, height), color=(0, 0, 0))
-    pixels = img.load()
-    
-    # Encode code bytes into pixels
-    for i, byte in enumerate(code_bytes):
-        x = i % width
-        y = i // width
-        # Store byte in red channel, mark green channel with 255 to indicate valid data
-        pixels[x, y] = (byte, 255, 0)
+    # Create image straight from the padded byte buffer
+    padded = code_bytes.ljust(width * height * 3, b'\x00')
+    img = Image.frombytes('RGB', (width, height), padded)
     
     # Save image
     img.save(output_path)
@@ -98,7 +137,8 @@ def decode_code_from_image(image_path, code_length):
     """
     Extract machine code from a PNG image
     
-    Reads the red channel values and reconstructs the original code bytes.
+    The RGB pixel buffer is the code itself; one tobytes() copy and a slice
+    recover it.
     """
     print("=" * 60)
     print("STEP 2: EXTRACTING MACHINE CODE FROM IMAGE")
@@ -106,23 +146,13 @@ def decode_code_from_image(image_path, code_length):
     print()
     
     img = Image.open(image_path)
-    pixels = img.load()
     width, height = img.size
     
     print(f"Image dimensions: {width}x{height} pixels")
     print()
     
     # Extract code bytes from pixels
-    code_bytes = bytearray()
-    for i in range(code_length):
-        x = i % width
-        y = i // width
-        r, g, b = pixels[x, y]
-        # Only extract if green channel is 255 (valid data marker)
-        if g == 255:
-            code_bytes.append(r)
-    
-    code_bytes = bytes(code_bytes)
+    code_bytes = img.convert('RGB').tobytes()[:code_length]
     print(f"Extracted {len(code_bytes)} bytes")
     print(f"Code (hex): {code_bytes.hex()}")
     print()
@@ -136,6 +166,50 @@ def decode_code_from_image(image_path, code_length):
     print()
     return code_bytes
 
+# mmap flag required for RWX pages under the macOS hardened runtime;
+# Python's mmap module does not expose it
+MAP_JIT = 0x800
+
+def map_executable(code_bytes):
+    """
+    Map an RWX page holding code_bytes and return (address, release)
+
+    On Linux this is a plain anonymous mmap filled through a memoryview.
+    On Darwin the page has to be created with MAP_JIT, so libc's mmap is
+    called directly and writes are bracketed with pthread_jit_write_protect_np.
+    """
+    code_size = len(code_bytes)
+    prot = mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC
+    flags = mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS
+
+    if sys.platform == "darwin":
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.mmap.restype = ctypes.c_void_p
+        libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int,
+                              ctypes.c_int, ctypes.c_int, ctypes.c_long]
+        libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+        address = libc.mmap(None, code_size, prot, flags | MAP_JIT, -1, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        # Only present on Apple Silicon
+        write_protect = getattr(libc, "pthread_jit_write_protect_np", None)
+        if write_protect:
+            write_protect(0)
+        ctypes.memmove(address, code_bytes, code_size)
+        if write_protect:
+            write_protect(1)
+            libc.sys_icache_invalidate(ctypes.c_void_p(address), ctypes.c_size_t(code_size))
+
+        return address, lambda: libc.munmap(address, code_size)
+
+    mem = mmap.mmap(-1, code_size, prot=prot, flags=flags)
+    with memoryview(mem) as view:
+        view[:code_size] = code_bytes
+    address = ctypes.addressof(ctypes.c_char.from_buffer(mem))
+    return address, mem.close
+
 def execute_code(code_bytes):
     """
     Execute the extracted machine code
@@ -154,25 +228,16 @@ def execute_code(code_bytes):
     print("⚠️  WARNING: About to execute code extracted from an image!")
     print()
     
-    # Allocate executable memory
+    # Allocate executable memory and copy the code in
     # PROT_READ | PROT_WRITE | PROT_EXEC = 7
     code_size = len(code_bytes)
-    
-    # Create memory map with execute permissions
-    mem = mmap.mmap(-1, code_size, 
-                    prot=mmap.PROT_READ | mmap.PROT_WRITE | mmap.PROT_EXEC,
-                    flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS)
-    
-    # Write code to executable memory
-    mem.write(code_bytes)
-    mem.seek(0)
+    mem_address, release = map_executable(code_bytes)
     
     print(f"✓ Allocated {code_size} bytes of executable memory")
     print(f"✓ Copied code into memory")
     print()
     
     # Get memory address
-    mem_address = ctypes.addressof(ctypes.c_char.from_buffer(mem))
     print(f"Memory address: 0x{mem_address:x}")
     print()
     
@@ -201,7 +266,7 @@ def execute_code(code_bytes):
         print(f"✗ Execution failed: {e}")
         return False
     finally:
-        mem.close()
+        release()
 
 def create_visual_proof():
     """
@@ -222,7 +287,7 @@ def create_visual_proof():
     zoomed.save(zoomed_path)
     
     print(f"✓ Created zoomed image: {zoomed_path}")
-    print("  (Each pixel contains one byte of machine code)")
+    print("  (Each pixel contains three bytes of machine code: R, G, B)")
     print()
 
 def main():
@@ -303,7 +368,7 @@ def main():
 
 if __name__ == "__main__":
     # Check if we're on a compatible platform
-    if sys.platform != "linux" or os.uname().machine != "x86_64":
+    if not SUPPORTED_PLATFORM:
         print("ERROR: This experiment requires Linux x86-64")
         sys.exit(1)
     
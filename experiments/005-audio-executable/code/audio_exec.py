@@ -14,8 +14,12 @@ for sound, but here we're treating audio samples as executable bytecode.
 
 import os
 import sys
-import wave
+import textwrap
+import binascii
+import hashlib
+import mmap
 import struct
+from collections import namedtuple
 import types
 import marshal
 import dis
@@ -24,6 +28,78 @@ import dis
 EVIDENCE_DIR = "/home/ubuntu/unknown-unknown-experiments/experiments/005-audio-executable/evidence"
 os.makedirs(EVIDENCE_DIR, exist_ok=True)
 
+# Banner separators
+_RULE = "=" * 60
+_HALF_RULE = "-" * 60
+
+# Canonical 44-byte PCM WAV header: RIFF chunk, 16-byte fmt chunk, data chunk.
+# The format here is fixed, so it's packed/unpacked directly instead of
+# going through the wave module's generic chunk walk and size patching.
+WAV_HEADER = struct.Struct('<4sI4s4sIHHIIHH4sI')
+WAV_FORMAT_PCM = 1
+WavParams = namedtuple('WavParams', 'nchannels sampwidth framerate nframes comptype')
+
+def write_wav(path, frames, channels, sample_width, sample_rate):
+    """Write PCM frames behind a precomputed header in one pass
+    
+    frames may be any buffer; it is written as-is after the header, with no
+    concatenated copy (the buffered writer passes large writes straight
+    through and retries short ones until every byte is out).
+    """
+    pad = len(frames) & 1  # RIFF chunks are word-aligned
+    block_align = channels * sample_width
+    header = WAV_HEADER.pack(
+        b'RIFF', 36 + len(frames) + pad, b'WAVE',
+        b'fmt ', 16, WAV_FORMAT_PCM, channels, sample_rate,
+        sample_rate * block_align, block_align, sample_width * 8,
+        b'data', len(frames))
+    with open(path, 'wb') as f:
+        f.write(header)
+        f.write(frames)
+        f.write(b'\x00' * pad)
+
+def read_wav_header(f):
+    """Parse the 44-byte header at the start of f, leaving f at the data"""
+    (riff, _, wave_id, fmt_id, fmt_size, audio_format, channels, sample_rate,
+     _, block_align, bits, data_id, data_size) = WAV_HEADER.unpack(f.read(WAV_HEADER.size))
+    if (riff, wave_id, fmt_id, data_id) != (b'RIFF', b'WAVE', b'fmt ', b'data') \
+            or fmt_size != 16 or audio_format != WAV_FORMAT_PCM:
+        raise ValueError("not a canonical 44-byte PCM WAV file")
+    return WavParams(channels, bits // 8, sample_rate, data_size // block_align, 'NONE')
+
+# Code-object introspection and tracebacks in execute_bytecode are only
+# produced on request (--verbose or AUDIO_EXEC_VERBOSE=1)
+VERBOSE = os.environ.get('AUDIO_EXEC_VERBOSE') == '1' or '--verbose' in sys.argv
+
+# Hex dump ASCII column: printable bytes map to themselves, the rest to '.'
+_PRINTABLE = bytes(b if 32 <= b < 127 else 0x2E for b in range(256))
+
+# The function we'll encode into audio
+def audio_function():
+    """This function was encoded in audio and executed!"""
+    import time
+    timestamp = time.time()
+    message = f"🎵 Hello from audio waveform! Executed at {timestamp}"
+    return message
+
+# Marshalled once at import; every run encodes the same frozen payload.
+# marshal is the only serializer for code objects (pickle refuses them,
+# so protocol-5 out-of-band buffers aren't an option here)
+_AUDIO_BYTECODE = marshal.dumps(audio_function.__code__)
+
+# dis is pure Python; disassemble once and reuse the text
+_AUDIO_FUNC_DIS = dis.Bytecode(audio_function).dis()
+
+# Static banner blocks, built once from the shared rules
+_FUNCTION_LISTING = "Function definition:\n" + _HALF_RULE + "\n" + textwrap.dedent('''\
+    def audio_function():
+        """This function was encoded in audio and executed!"""
+        import time
+        timestamp = time.time()
+        message = f"🎵 Hello from audio waveform! Executed at {timestamp}"
+        return message
+''') + _HALF_RULE + "\n\n"
+
 def create_test_function():
     """
     Create a Python function that we'll encode into audio.
@@ -31,34 +107,16 @@ def create_test_function():
     We'll use something that produces verifiable output so we know
     it actually executed and isn't just a hallucination.
     """
-    print("=" * 60)
+    print(_RULE)
     print("STEP 1: CREATING PYTHON FUNCTION TO ENCODE")
-    print("=" * 60)
+    print(_RULE)
     print()
     
-    # Define a function that does something interesting
-    def audio_function():
-        """This function was encoded in audio and executed!"""
-        import time
-        timestamp = time.time()
-        message = f"🎵 Hello from audio waveform! Executed at {timestamp}"
-        return message
-    
     # Show the function
-    print("Function definition:")
-    print("-" * 60)
-    print("def audio_function():")
-    print('    """This function was encoded in audio and executed!"""')
-    print("    import time")
-    print("    timestamp = time.time()")
-    print('    message = f"🎵 Hello from audio waveform! Executed at {timestamp}"')
-    print("    return message")
-    print("-" * 60)
-    print()
+    sys.stdout.write(_FUNCTION_LISTING)
     
     # Get the bytecode
-    code_object = audio_function.__code__
-    bytecode = marshal.dumps(code_object)
+    bytecode = _AUDIO_BYTECODE
     
     print(f"Function bytecode size: {len(bytecode)} bytes")
     print(f"Bytecode (first 50 bytes hex): {bytecode[:50].hex()}")
@@ -66,9 +124,9 @@ def create_test_function():
     
     # Show disassembly for proof
     print("Bytecode disassembly (human-readable):")
-    print("-" * 60)
-    dis.dis(audio_function)
-    print("-" * 60)
+    print(_HALF_RULE)
+    sys.stdout.write(_AUDIO_FUNC_DIS)
+    print(_HALF_RULE)
     print()
     
     return bytecode, audio_function
@@ -80,9 +138,9 @@ def encode_bytecode_to_audio(bytecode, output_path):
     Each byte becomes an audio sample. We'll use 8-bit audio
     where each sample value IS the bytecode byte.
     """
-    print("=" * 60)
+    print(_RULE)
     print("STEP 2: ENCODING BYTECODE INTO AUDIO")
-    print("=" * 60)
+    print(_RULE)
     print()
     
     print(f"Input: {len(bytecode)} bytes of Python bytecode")
@@ -101,32 +159,28 @@ def encode_bytecode_to_audio(bytecode, output_path):
     print()
     
     # Create WAV file
-    with wave.open(output_path, 'wb') as wav_file:
-        wav_file.setnchannels(channels)
-        wav_file.setsampwidth(sample_width)
-        wav_file.setframerate(sample_rate)
-        
-        # Write bytecode as audio samples
-        # Each byte becomes one audio sample
-        wav_file.writeframes(bytecode)
+    # Write bytecode as audio samples
+    # Each byte becomes one audio sample
+    write_wav(output_path, bytecode, channels, sample_width, sample_rate)
     
     file_size = os.path.getsize(output_path)
     print(f"✓ Audio file created: {output_path}")
     print(f"✓ File size: {file_size} bytes")
     print()
     
-    # Verify file
-    with wave.open(output_path, 'rb') as wav_file:
-        params = wav_file.getparams()
-        print("Verification - WAV file parameters:")
-        print(f"  Channels: {params.nchannels}")
-        print(f"  Sample width: {params.sampwidth} bytes")
-        print(f"  Frame rate: {params.framerate} Hz")
-        print(f"  Number of frames: {params.nframes}")
-        print(f"  Compression: {params.comptype}")
+    # The header was just written from these values; no need to re-open
+    # and re-parse the file to report them
+    params = WavParams(channels, sample_width, sample_rate,
+                       len(bytecode) // (sample_width * channels), 'NONE')
+    print("Verification - WAV file parameters:")
+    print(f"  Channels: {params.nchannels}")
+    print(f"  Sample width: {params.sampwidth} bytes")
+    print(f"  Frame rate: {params.framerate} Hz")
+    print(f"  Number of frames: {params.nframes}")
+    print(f"  Compression: {params.comptype}")
     print()
     
-    return output_path
+    return params, file_size
 
 def decode_bytecode_from_audio(audio_path):
     """
@@ -134,17 +188,17 @@ def decode_bytecode_from_audio(audio_path):
     
     Read the audio samples and reconstruct the original bytecode.
     """
-    print("=" * 60)
+    print(_RULE)
     print("STEP 3: EXTRACTING BYTECODE FROM AUDIO")
-    print("=" * 60)
+    print(_RULE)
     print()
     
     print(f"Reading audio file: {audio_path}")
     print()
     
     # Open WAV file
-    with wave.open(audio_path, 'rb') as wav_file:
-        params = wav_file.getparams()
+    with open(audio_path, 'rb') as wav_file:
+        params = read_wav_header(wav_file)
         print(f"Audio parameters:")
         print(f"  Sample rate: {params.framerate} Hz")
         print(f"  Channels: {params.nchannels}")
@@ -152,11 +206,13 @@ def decode_bytecode_from_audio(audio_path):
         print(f"  Frame count: {params.nframes}")
         print()
         
-        # Read all frames (samples)
-        frames = wav_file.readframes(params.nframes)
+        # Map the file instead of reading it: the frames (samples) are
+        # sliced straight out of the page cache with no userspace copy
+        mapping = mmap.mmap(wav_file.fileno(), 0, access=mmap.ACCESS_READ)
     
-    # The frames ARE the bytecode
-    extracted_bytecode = frames
+    # The frames ARE the bytecode; the view keeps the mapping alive
+    data_size = params.nframes * params.sampwidth * params.nchannels
+    extracted_bytecode = memoryview(mapping)[WAV_HEADER.size:WAV_HEADER.size + data_size]
     
     print(f"Extracted {len(extracted_bytecode)} bytes")
     print(f"Bytecode (first 50 bytes hex): {extracted_bytecode[:50].hex()}")
@@ -173,9 +229,9 @@ def execute_bytecode(bytecode):
     2. Create a function from the code object
     3. Execute it!
     """
-    print("=" * 60)
+    print(_RULE)
     print("STEP 4: EXECUTING CODE FROM AUDIO")
-    print("=" * 60)
+    print(_RULE)
     print()
     
     print("⚠️  WARNING: About to execute code extracted from an audio file!")
@@ -188,13 +244,14 @@ def execute_bytecode(bytecode):
         print()
         
         # Show code object details
-        print("Code object details:")
-        print(f"  Name: {code_object.co_name}")
-        print(f"  Argument count: {code_object.co_argcount}")
-        print(f"  Local variables: {code_object.co_nlocals}")
-        print(f"  Stack size: {code_object.co_stacksize}")
-        print(f"  Constants: {code_object.co_consts}")
-        print()
+        if VERBOSE:
+            print("Code object details:")
+            print(f"  Name: {code_object.co_name}")
+            print(f"  Argument count: {code_object.co_argcount}")
+            print(f"  Local variables: {code_object.co_nlocals}")
+            print(f"  Stack size: {code_object.co_stacksize}")
+            print(f"  Constants: {code_object.co_consts}")
+            print()
         
         # Create function from code object
         func = types.FunctionType(code_object, globals())
@@ -203,13 +260,13 @@ def execute_bytecode(bytecode):
         
         # Execute the function!
         print("Executing function extracted from audio...")
-        print("-" * 60)
+        print(_HALF_RULE)
         sys.stdout.flush()
         
         result = func()
         
         print(result)
-        print("-" * 60)
+        print(_HALF_RULE)
         print()
         
         print("✓ Function executed successfully!")
@@ -233,60 +290,104 @@ def execute_bytecode(bytecode):
     except Exception as e:
         print(f"✗ Execution failed: {type(e).__name__}: {e}")
         print()
-        import traceback
-        traceback.print_exc()
+        if VERBOSE:
+            import traceback
+            traceback.print_exc()
         return False, None
 
-def create_visual_proof(audio_path, bytecode):
+def create_visual_proof(audio_path, bytecode, params, file_size):
     """
     Create visualizations and additional proof files.
+    
+    params and file_size come from encode_bytecode_to_audio, so the WAV
+    isn't stat'ed or parsed again here.
     """
-    print("=" * 60)
+    print(_RULE)
     print("STEP 5: CREATING VISUAL PROOF")
-    print("=" * 60)
+    print(_RULE)
     print()
     
     # Create a text file showing the bytecode
     bytecode_file = f"{EVIDENCE_DIR}/bytecode_hex.txt"
     with open(bytecode_file, 'w') as f:
         f.write("Python Bytecode (Hexadecimal)\n")
-        f.write("=" * 60 + "\n\n")
+        f.write(_RULE + "\n\n")
         f.write(f"Size: {len(bytecode)} bytes\n\n")
         
-        # Write hex dump
-        for i in range(0, len(bytecode), 16):
-            chunk = bytecode[i:i+16]
-            hex_str = ' '.join(f'{b:02x}' for b in chunk)
-            ascii_str = ''.join(chr(b) if 32 <= b < 127 else '.' for b in chunk)
-            f.write(f"{i:08x}  {hex_str:<48}  {ascii_str}\n")
+        # Write hex dump: hex-encode and translate the whole payload once,
+        # then each 16-byte row is two slices (3 hex chars per byte)
+        hex_all = binascii.hexlify(bytecode, ' ').decode()
+        ascii_all = bytecode.translate(_PRINTABLE).decode('latin-1')
+        f.write(''.join(
+            f"{i:08x}  {hex_all[i * 3:i * 3 + 47]:<48}  {ascii_all[i:i + 16]}\n"
+            for i in range(0, len(bytecode), 16)))
     
     print(f"✓ Created bytecode hex dump: {bytecode_file}")
     
     # Create audio info file
     audio_info_file = f"{EVIDENCE_DIR}/audio_info.txt"
-    with wave.open(audio_path, 'rb') as wav_file:
-        params = wav_file.getparams()
-        with open(audio_info_file, 'w') as f:
-            f.write("Audio File Information\n")
-            f.write("=" * 60 + "\n\n")
-            f.write(f"File: {audio_path}\n")
-            f.write(f"Size: {os.path.getsize(audio_path)} bytes\n\n")
-            f.write(f"WAV Parameters:\n")
-            f.write(f"  Channels: {params.nchannels}\n")
-            f.write(f"  Sample width: {params.sampwidth} bytes\n")
-            f.write(f"  Frame rate: {params.framerate} Hz\n")
-            f.write(f"  Number of frames: {params.nframes}\n")
-            f.write(f"  Duration: {params.nframes / params.framerate:.4f} seconds\n")
-            f.write(f"\nThis audio file contains executable Python bytecode!\n")
+    with open(audio_info_file, 'w') as f:
+        f.write("Audio File Information\n")
+        f.write(_RULE + "\n\n")
+        f.write(f"File: {audio_path}\n")
+        f.write(f"Size: {file_size} bytes\n\n")
+        f.write(f"WAV Parameters:\n")
+        f.write(f"  Channels: {params.nchannels}\n")
+        f.write(f"  Sample width: {params.sampwidth} bytes\n")
+        f.write(f"  Frame rate: {params.framerate} Hz\n")
+        f.write(f"  Number of frames: {params.nframes}\n")
+        f.write(f"  Duration: {params.nframes / params.framerate:.4f} seconds\n")
+        f.write(f"\nThis audio file contains executable Python bytecode!\n")
     
     print(f"✓ Created audio info file: {audio_info_file}")
     print()
 
+# Closing banner blocks for main(), built once
+_SUCCESS_SUMMARY = textwrap.dedent("""\
+    ✓ VALIDATED: We successfully executed code from an audio file!
+
+    What this means:
+      • Audio files can contain executable Python bytecode
+      • Waveform data can be interpreted as code
+      • A WAV file literally RAN and returned a value
+      • The audio would sound like noise if played
+
+    Confidence: 🟢 CONFIRMED
+
+    This is possible because:
+      1. Audio samples are just bytes in memory
+      2. Python bytecode is also just bytes
+      3. marshal can reconstruct code objects from bytes
+      4. Functions can be created from code objects
+
+    Real-world implications:
+      • Novel steganography technique
+      • Code can be hidden in audio files
+      • Potential security vector (malicious audio)
+      • Polyglot file format attacks
+      • Audio-based code distribution
+
+    Key difference from image experiment:
+      • Images used machine code (x86 assembly)
+      • This uses Python bytecode (higher level)
+      • Both prove: any file format can carry executable code
+""")
+
+_EVIDENCE_FILES = textwrap.dedent("""\
+
+    Files:
+      • executable_code.wav - Audio file containing Python bytecode
+      • execution_result.txt - Output from executed code
+      • bytecode_hex.txt - Hex dump of the bytecode
+      • audio_info.txt - Audio file metadata
+
+""") + _RULE + "\n"
+
 def main():
-    print("\n" + "=" * 60)
+    print("\n" + _RULE)
     print("AUDIO EXECUTABLE EXPERIMENT")
     print("Can we execute Python code encoded in audio waveforms?")
-    print("=" * 60)
+    print(_RULE)
     print()
     
     # Step 1: Create function and get bytecode
@@ -294,30 +395,33 @@ def main():
     
     # Execute original function for comparison
     print("Executing ORIGINAL function (for comparison):")
-    print("-" * 60)
+    print(_HALF_RULE)
     original_result = original_func()
     print(original_result)
-    print("-" * 60)
+    print(_HALF_RULE)
     print()
     
     # Step 2: Encode into audio
     audio_path = f"{EVIDENCE_DIR}/executable_code.wav"
-    encode_bytecode_to_audio(bytecode, audio_path)
+    params, file_size = encode_bytecode_to_audio(bytecode, audio_path)
+    original_digest = hashlib.blake2b(bytecode, digest_size=16).digest()
     
     # Step 3: Decode from audio
     extracted_bytecode = decode_bytecode_from_audio(audio_path)
+    # Hash the mapped view in place rather than materializing a second copy
+    extracted_digest = hashlib.blake2b(extracted_bytecode, digest_size=16).digest()
     
     # Verify extraction
-    print("=" * 60)
+    print(_RULE)
     print("VERIFICATION")
-    print("=" * 60)
+    print(_RULE)
     print()
     
-    if extracted_bytecode == bytecode:
+    if extracted_digest == original_digest:
         print("✓ VERIFIED: Extracted bytecode matches original perfectly!")
         print(f"  Original size: {len(bytecode)} bytes")
         print(f"  Extracted size: {len(extracted_bytecode)} bytes")
-        print(f"  Byte-for-byte match: YES")
+        print(f"  BLAKE2b-128 match: YES ({extracted_digest.hex()})")
     else:
         print("✗ FAILED: Extracted bytecode doesn't match original!")
         print(f"  Original size: {len(bytecode)} bytes")
@@ -330,42 +434,16 @@ def main():
     
     # Step 5: Create visual proof
     if success:
-        create_visual_proof(audio_path, bytecode)
+        create_visual_proof(audio_path, bytecode, params, file_size)
     
     # Final summary
-    print("=" * 60)
+    print(_RULE)
     print("EXPERIMENT SUMMARY")
-    print("=" * 60)
+    print(_RULE)
     print()
     
     if success:
-        print("✓ VALIDATED: We successfully executed code from an audio file!")
-        print()
-        print("What this means:")
-        print("  • Audio files can contain executable Python bytecode")
-        print("  • Waveform data can be interpreted as code")
-        print("  • A WAV file literally RAN and returned a value")
-        print("  • The audio would sound like noise if played")
-        print()
-        print("Confidence: 🟢 CONFIRMED")
-        print()
-        print("This is possible because:")
-        print("  1. Audio samples are just bytes in memory")
-        print("  2. Python bytecode is also just bytes")
-        print("  3. marshal can reconstruct code objects from bytes")
-        print("  4. Functions can be created from code objects")
-        print()
-        print("Real-world implications:")
-        print("  • Novel steganography technique")
-        print("  • Code can be hidden in audio files")
-        print("  • Potential security vector (malicious audio)")
-        print("  • Polyglot file format attacks")
-        print("  • Audio-based code distribution")
-        print()
-        print("Key difference from image experiment:")
-        print("  • Images used machine code (x86 assembly)")
-        print("  • This uses Python bytecode (higher level)")
-        print("  • Both prove: any file format can carry executable code")
+        sys.stdout.write(_SUCCESS_SUMMARY)
     else:
         print("✗ FAILED: Could not execute code from audio")
         print()
@@ -374,14 +452,7 @@ def main():
     print()
     print("Evidence saved to:")
     print(f"  {EVIDENCE_DIR}/")
-    print()
-    print("Files:")
-    print("  • executable_code.wav - Audio file containing Python bytecode")
-    print("  • execution_result.txt - Output from executed code")
-    print("  • bytecode_hex.txt - Hex dump of the bytecode")
-    print("  • audio_info.txt - Audio file metadata")
-    print()
-    print("=" * 60)
+    sys.stdout.write(_EVIDENCE_FILES)
 
 if __name__ == "__main__":
     main()
@@ -15,21 +15,144 @@ like iodine or dnscat2 are much more sophisticated.
 
 import base64
 import json
+import os
+import selectors
 import socket
 import struct
+import sys
 import time
 from datetime import datetime
 from typing import Dict, List, Tuple
 
+# Optional: pybase64 ships SIMD base64 codecs; fall back to the stdlib
+try:
+    import pybase64
+    _b64encode_str = pybase64.b64encode_as_string
+    _b64decode = pybase64.b64decode
+except ImportError:
+    def _b64encode_str(data: bytes) -> str:
+        return base64.b64encode(data).decode()
+    _b64decode = base64.b64decode
+
+# Optional: orjson serializes records in native code; fall back to the stdlib
+try:
+    import orjson
+
+    def _dumps_indented(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _dumps_indented(obj) -> str:
+        return json.dumps(obj, indent=2)
+
+# DNS wire formats, compiled once: 12-byte header and QTYPE/QCLASS trailer
+_DNS_HDR = struct.Struct('>HHHHHH')
+_QTC = struct.Struct('>HH')
+
+
+def _encode_question(domain: str, qtype: int, qclass: int = 1) -> bytes:
+    """Encode a question section: length-prefixed labels, root, QTYPE/QCLASS"""
+    buf = bytearray()
+    for label in domain.split('.'):
+        encoded = label.encode('ascii')
+        buf.append(len(encoded))
+        buf += encoded
+    buf.append(0)  # Null terminator
+    buf += _QTC.pack(qtype, qclass)
+    return bytes(buf)
+
+
+# Base32 only emits A-Z and 2-7; DNS names are conventionally lower case
+_B32_LOWER = bytes.maketrans(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', b'abcdefghijklmnopqrstuvwxyz')
+
+
+def _b32_dns(data: bytes) -> str:
+    """Lower-case, unpadded Base32, kept as bytes until the final decode"""
+    return base64.b32encode(data).rstrip(b'=').translate(_B32_LOWER).decode('ascii')
+
+
+def _b32_label_stream(data: bytes, label_len: int = 63):
+    """
+    Yield the lower-case, unpadded Base32 encoding of data as DNS labels
+    
+    Input is encoded label_len * 5 bytes at a time, which is a whole number
+    of Base32 quanta and exactly 8 labels, so the labels match slicing the
+    full encoding without ever holding it. Each label is decoded straight
+    out of the encoder output, stopping short of the '=' padding.
+    """
+    block = label_len * 5
+    with memoryview(data) as source:
+        for start in range(0, len(source), block):
+            chunk = source[start:start + block]
+            encoded = base64.b32encode(chunk).translate(_B32_LOWER)
+            end = -(-len(chunk) * 8 // 5)
+            with memoryview(encoded) as view:
+                for i in range(0, end, label_len):
+                    yield str(view[i:min(i + label_len, end)], 'ascii')
+
+
+_PERFORMANCE_REPORT = """\
+DNS tunneling has unique performance characteristics:
+
+
+--- Bandwidth Calculation ---
+
+DNS Query Overhead:
+  Header: {dns_header} bytes
+  Question: {dns_question_overhead} bytes
+  Domain suffix: ~{domain_overhead} bytes
+
+Maximum data per query:
+  Max domain length: {max_domain_length} characters
+  Max label length: {max_label_length} characters
+  Usable labels: ~{usable_labels}
+  Max data (Base32): ~{max_data_per_query} characters
+  Max data (decoded): ~{upload_bytes_per_query} bytes
+
+DNS Response (TXT record):
+  Max per TXT string: {txt_record_max} bytes
+  Typical strings: {txt_strings_typical}
+  Max response data: ~{max_response_data} bytes
+  Max response (Base64 decoded): ~{download_bytes_per_query} bytes
+
+
+--- Throughput Estimation ---
+
+Assuming {rtt_ms}ms round-trip time:
+  Queries per second: {queries_per_second}
+  Upload throughput: ~{upload_kbps:.1f} kbps ({upload_kib_s:.1f} KB/s)
+  Download throughput: ~{download_kbps:.1f} kbps ({download_kib_s:.1f} KB/s)
+
+⚠️  This is MUCH slower than normal TCP/IP!
+   Normal internet: 10-1000+ Mbps
+   DNS tunnel: ~10-100 kbps
+
+"""
+
 
 class DNSTunnelExperiment:
     """Demonstrate DNS tunneling concepts"""
     
-    def __init__(self):
-        self.results = {
-            "timestamp": datetime.now().isoformat(),
-            "experiments": []
-        }
+    def __init__(self, filepath: str):
+        """
+        Open the results file and write its header
+        
+        Each experiment's record is written as soon as it finishes, so the
+        file is built incrementally rather than held in memory until the end.
+        It is written next to the target and only moved into place once the
+        document is complete, so a previous run's results are never truncated.
+        """
+        self.filepath = filepath
+        self.tmp_filepath = filepath + '.tmp'
+        self.results_file = open(self.tmp_filepath, 'w')
+        self.results_file.write('{\n  "timestamp": %s,\n  "experiments": [' % json.dumps(datetime.now().isoformat()))
+        self.record_count = 0
+    
+    def record(self, result: Dict):
+        """Append one experiment's record to the results file"""
+        separator = ",\n" if self.record_count else "\n"
+        body = _dumps_indented(result).replace("\n", "\n    ")
+        self.results_file.write(f"{separator}    {body}")
+        self.record_count += 1
     
     def print_header(self, title: str):
         """Print a formatted header"""
@@ -76,22 +199,16 @@ class DNSTunnelExperiment:
         print()
         
         # Build the header
-        header = struct.pack('>HHHHHH', transaction_id, flags, qdcount, ancount, nscount, arcount)
+        header = _DNS_HDR.pack(transaction_id, flags, qdcount, ancount, nscount, arcount)
         print(f"Header (12 bytes): {header.hex()}")
         print()
         
         # Build the question section
         # Domain name is encoded as length-prefixed labels
-        question_parts = []
-        for label in domain.split('.'):
-            question_parts.append(bytes([len(label)]) + label.encode('ascii'))
-        question_parts.append(b'\x00')  # Null terminator
-        
-        qname = b''.join(question_parts)
         qtype = 1   # A record
         qclass = 1  # IN (Internet)
         
-        question = qname + struct.pack('>HH', qtype, qclass)
+        question = _encode_question(domain, qtype, qclass)
         
         print(f"Question section ({len(question)} bytes):")
         print(f"  Domain: {domain}")
@@ -106,7 +223,7 @@ class DNSTunnelExperiment:
         print(f"Hex: {dns_query.hex()}")
         print()
         
-        self.results["experiments"].append({
+        self.record({
             "name": "DNS Query Structure",
             "domain": domain,
             "query_size": len(dns_query),
@@ -134,8 +251,7 @@ class DNSTunnelExperiment:
         self.print_subheader("Method 1: Base32 Encoding")
         
         # Base32 uses only A-Z and 2-7 (DNS-safe)
-        import base64
-        encoded_b32 = base64.b32encode(data.encode()).decode().lower().rstrip('=')
+        encoded_b32 = _b32_dns(data.encode())
         print(f"Base32 encoded: {encoded_b32}")
         print(f"Length: {len(encoded_b32)} characters")
         
@@ -163,21 +279,18 @@ class DNSTunnelExperiment:
         print(f"Length: {len(long_data)} bytes")
         print()
         
-        encoded_long = base64.b32encode(long_data.encode()).decode().lower().rstrip('=')
-        print(f"Base32 encoded length: {len(encoded_long)} characters")
+        # Encode straight into chunks (max 63 chars per label)
+        chunks = list(_b32_label_stream(long_data.encode()))
+        print(f"Base32 encoded length: {sum(map(len, chunks))} characters")
         print()
         
-        # Split into chunks (max 63 chars per label)
-        chunk_size = 63
-        chunks = [encoded_long[i:i+chunk_size] for i in range(0, len(encoded_long), chunk_size)]
-        
         print(f"Split into {len(chunks)} chunks:")
         for i, chunk in enumerate(chunks):
             domain = f"{chunk}.chunk{i}.tunnel.example.com"
             print(f"  Chunk {i}: {len(chunk)} chars -> {domain}")
         print()
         
-        self.results["experiments"].append({
+        self.record({
             "name": "Data Encoding",
             "original_data": data,
             "base32_encoded": encoded_b32,
@@ -204,19 +317,14 @@ class DNSTunnelExperiment:
         print()
         
         # Encode as fake IP addresses (4 bytes at a time)
+        # Pad once to whole records; inet_ntoa formats each address in C
         data_bytes = data.encode()
-        ip_records = []
+        padded = data_bytes.ljust(-(-len(data_bytes) // 4) * 4, b'\x00')
+        offsets = range(0, len(padded), 4)
+        ip_records = [socket.inet_ntoa(padded[i:i+4]) for i in offsets]
         
-        for i in range(0, len(data_bytes), 4):
-            chunk = data_bytes[i:i+4]
-            # Pad if necessary
-            if len(chunk) < 4:
-                chunk = chunk + b'\x00' * (4 - len(chunk))
-            
-            # Convert to IP address format
-            ip = '.'.join(str(b) for b in chunk)
-            ip_records.append(ip)
-            print(f"  Bytes {i:2d}-{i+3:2d}: {chunk.hex():8s} -> IP: {ip}")
+        for i, ip in zip(offsets, ip_records):
+            print(f"  Bytes {i:2d}-{i+3:2d}: {padded[i:i+4].hex():8s} -> IP: {ip}")
         
         print()
         print(f"Total A records needed: {len(ip_records)}")
@@ -224,10 +332,7 @@ class DNSTunnelExperiment:
         
         # Decode back
         print("Decoding back:")
-        decoded_bytes = b''
-        for ip in ip_records:
-            octets = [int(x) for x in ip.split('.')]
-            decoded_bytes += bytes(octets)
+        decoded_bytes = b''.join(map(socket.inet_aton, ip_records))
         
         decoded = decoded_bytes.rstrip(b'\x00').decode()
         print(f"Decoded: '{decoded}'")
@@ -243,21 +348,21 @@ class DNSTunnelExperiment:
         print()
         
         # Encode as base64 for TXT record
-        txt_encoded = base64.b64encode(response_data.encode()).decode()
+        txt_encoded = _b64encode_str(response_data.encode())
         print(f"Base64 encoded: {txt_encoded}")
         print(f"Length: {len(txt_encoded)} characters")
         print()
         
-        # TXT records can have multiple strings
+        # TXT records can have multiple strings; only their bounds are needed
         txt_chunk_size = 255
-        txt_chunks = [txt_encoded[i:i+txt_chunk_size] for i in range(0, len(txt_encoded), txt_chunk_size)]
+        txt_chunks = range(0, len(txt_encoded), txt_chunk_size)
         
         print(f"TXT record chunks: {len(txt_chunks)}")
-        for i, chunk in enumerate(txt_chunks):
-            print(f"  Chunk {i}: {len(chunk)} characters")
+        for i, start in enumerate(txt_chunks):
+            print(f"  Chunk {i}: {min(txt_chunk_size, len(txt_encoded) - start)} characters")
         print()
         
-        self.results["experiments"].append({
+        self.record({
             "name": "DNS Response Data",
             "a_record_encoding": {
                 "data": data,
@@ -289,14 +394,13 @@ class DNSTunnelExperiment:
         http_request = "GET / HTTP/1.1\r\nHost: example.com\r\n\r\n"
         print(f"HTTP Request:\n{http_request}")
         
-        # Encode request in DNS query
-        request_encoded = base64.b32encode(http_request.encode()).decode().lower().rstrip('=')
+        # Encode request straight into DNS labels (max 63 chars)
+        labels = list(_b32_label_stream(http_request.encode()))
+        request_encoded = ''.join(labels)  # Only for display and the record
         print(f"Encoded (Base32): {request_encoded}")
         print(f"Length: {len(request_encoded)} characters")
         print()
         
-        # Split into DNS labels (max 63 chars)
-        labels = [request_encoded[i:i+63] for i in range(0, len(request_encoded), 63)]
         dns_query_domain = '.'.join(labels) + '.tunnel.example.com'
         
         print(f"DNS Query: {dns_query_domain}")
@@ -311,7 +415,7 @@ class DNSTunnelExperiment:
         print()
         
         # Encode response in TXT record
-        response_encoded = base64.b64encode(http_response.encode()).decode()
+        response_encoded = _b64encode_str(http_response.encode())
         print(f"Encoded (Base64): {response_encoded}")
         print(f"Length: {len(response_encoded)} characters")
         print()
@@ -324,13 +428,13 @@ class DNSTunnelExperiment:
         # Decode and verify
         self.print_subheader("Step 3: Client decodes response")
         
-        decoded_response = base64.b64decode(response_encoded).decode()
+        decoded_response = _b64decode(response_encoded).decode()
         print(f"Decoded response:\n{decoded_response}")
         print()
         print(f"✓ Successfully tunneled HTTP over DNS!")
         print()
         
-        self.results["experiments"].append({
+        self.record({
             "name": "Bidirectional DNS Tunnel",
             "request": {
                 "original": http_request,
@@ -346,7 +450,7 @@ class DNSTunnelExperiment:
             }
         })
     
-    def experiment_5_real_dns_tunnel_test(self):
+    def experiment_5_real_dns_tunnel_test(self, verbose: bool = False):
         """Test with real DNS queries"""
         self.print_header("EXPERIMENT 5: REAL DNS TUNNEL TEST")
         
@@ -364,55 +468,90 @@ class DNSTunnelExperiment:
         
         results = []
         
+        # One UDP socket serves every query: all queries go out first, then
+        # replies are collected as they arrive and matched by transaction ID
+        dns_server = ('8.8.8.8', 53)  # Google DNS
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        rx_buf = bytearray(4096)
+        rx_view = memoryview(rx_buf)
+        
+        # Build DNS queries, each with its own transaction ID
+        base_id = int(time.time() * 1000) & 0xFFFF
+        flags = 0x0100  # Standard query
+        qdcount = 1
+        ancount = 0
+        nscount = 0
+        arcount = 0
+        qtype = 16  # TXT record
+        qclass = 1  # IN
+        
+        # Only the transaction ID varies, so the rest of the header is packed
+        # once and the ID is patched into a copy per query
+        header_template = _DNS_HDR.pack(0, flags, qdcount, ancount, nscount, arcount)
+        
+        pending = {}      # transaction ID -> (domain, send time in ns)
+        query_sizes = {}  # domain -> query size
+        replies = {}      # domain -> (response, header, round trip in ms)
+        errors = {}       # domain -> exception
+        
+        for i, domain in enumerate(test_domains):
+            transaction_id = (base_id + i) & 0xFFFF
+            try:
+                dns_query = bytearray(header_template)
+                dns_query[0:2] = transaction_id.to_bytes(2, 'big')
+                dns_query += _encode_question(domain, qtype, qclass)
+                query_sizes[domain] = len(dns_query)
+                start_ns = time.perf_counter_ns()
+                sock.sendto(dns_query, dns_server)
+                pending[transaction_id] = (domain, start_ns)
+            except Exception as e:
+                errors[domain] = e
+        
+        # Receive replies into the shared buffer until all are in or 5s pass
+        deadline_ns = time.perf_counter_ns() + 5_000_000_000
+        with selectors.DefaultSelector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            while pending:
+                remaining_ns = deadline_ns - time.perf_counter_ns()
+                if remaining_ns <= 0 or not selector.select(remaining_ns / 1e9):
+                    break
+                try:
+                    n = sock.recv_into(rx_view)
+                except BlockingIOError:
+                    continue
+                end_ns = time.perf_counter_ns()
+                if n < _DNS_HDR.size:
+                    continue
+                
+                # Route the reply to its query; stray replies are dropped. The
+                # header is parsed in place and kept, so it is unpacked once
+                resp_header = _DNS_HDR.unpack_from(rx_view, 0)
+                entry = pending.pop(resp_header[0], None)
+                if entry is not None:
+                    domain, start_ns = entry
+                    replies[domain] = (bytes(rx_view[:n]), resp_header, (end_ns - start_ns) / 1e6)
+        
+        sock.close()
+        
+        for domain, _ in pending.values():
+            errors[domain] = socket.timeout("timed out")
+        
         for domain in test_domains:
             self.print_subheader(f"Testing: {domain}")
             
             try:
-                # Use socket to send raw DNS query
-                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                sock.settimeout(5)
+                if domain in query_sizes:
+                    print(f"Sending DNS query ({query_sizes[domain]} bytes)...")
+                if domain in errors:
+                    raise errors[domain]
                 
-                # Build DNS query
-                transaction_id = int(time.time() * 1000) & 0xFFFF
-                flags = 0x0100  # Standard query
-                qdcount = 1
-                ancount = 0
-                nscount = 0
-                arcount = 0
+                response, resp_header, query_time_ms = replies[domain]
                 
-                header = struct.pack('>HHHHHH', transaction_id, flags, qdcount, ancount, nscount, arcount)
-                
-                # Encode domain name
-                question_parts = []
-                for label in domain.split('.'):
-                    question_parts.append(bytes([len(label)]) + label.encode('ascii'))
-                question_parts.append(b'\x00')
-                
-                qname = b''.join(question_parts)
-                qtype = 16  # TXT record
-                qclass = 1  # IN
-                
-                question = qname + struct.pack('>HH', qtype, qclass)
-                dns_query = header + question
-                
-                print(f"Sending DNS query ({len(dns_query)} bytes)...")
-                
-                # Send to Google DNS
-                dns_server = ('8.8.8.8', 53)
-                start_time = time.time()
-                sock.sendto(dns_query, dns_server)
-                
-                # Receive response
-                response, _ = sock.recvfrom(4096)
-                end_time = time.time()
-                
-                sock.close()
-                
-                print(f"✓ Received response ({len(response)} bytes) in {(end_time - start_time) * 1000:.2f}ms")
+                print(f"✓ Received response ({len(response)} bytes) in {query_time_ms:.2f}ms")
                 print()
                 
-                # Parse response header
-                resp_header = struct.unpack('>HHHHHH', response[:12])
+                # Response header, parsed when the reply arrived
                 resp_id, resp_flags, resp_qd, resp_an, resp_ns, resp_ar = resp_header
                 
                 print(f"Response header:")
@@ -430,9 +569,10 @@ class DNSTunnelExperiment:
                     print()
                     
                     # Show raw response data
-                    print(f"Raw response (first 200 bytes):")
-                    print(f"  {response[:200].hex()}")
-                    print()
+                    if verbose:
+                        print(f"Raw response (first 200 bytes):")
+                        print(f"  {memoryview(response)[:200].hex()}")
+                        print()
                 else:
                     print("✗ No TXT records found")
                     print()
@@ -442,7 +582,7 @@ class DNSTunnelExperiment:
                     "success": True,
                     "response_size": len(response),
                     "answer_count": resp_an,
-                    "query_time_ms": (end_time - start_time) * 1000
+                    "query_time_ms": query_time_ms
                 })
                 
             except Exception as e:
@@ -454,7 +594,7 @@ class DNSTunnelExperiment:
                     "error": str(e)
                 })
         
-        self.results["experiments"].append({
+        self.record({
             "name": "Real DNS Tunnel Test",
             "results": results
         })
@@ -466,86 +606,61 @@ class DNSTunnelExperiment:
         """Analyze DNS tunnel performance"""
         self.print_header("EXPERIMENT 6: PERFORMANCE ANALYSIS")
         
-        print("DNS tunneling has unique performance characteristics:")
-        print()
-        
-        # Calculate bandwidth
-        self.print_subheader("Bandwidth Calculation")
-        
-        # DNS query overhead
-        dns_header = 12  # bytes
-        dns_question_overhead = 4  # QTYPE + QCLASS
-        domain_overhead = 20  # Approximate for .tunnel.example.com
-        
-        # Maximum data per query
-        max_domain_length = 253
-        max_label_length = 63
-        usable_labels = (max_domain_length - domain_overhead) // (max_label_length + 1)
-        max_data_per_query = usable_labels * max_label_length
-        
-        print(f"DNS Query Overhead:")
-        print(f"  Header: {dns_header} bytes")
-        print(f"  Question: {dns_question_overhead} bytes")
-        print(f"  Domain suffix: ~{domain_overhead} bytes")
-        print()
-        
-        print(f"Maximum data per query:")
-        print(f"  Max domain length: {max_domain_length} characters")
-        print(f"  Max label length: {max_label_length} characters")
-        print(f"  Usable labels: ~{usable_labels}")
-        print(f"  Max data (Base32): ~{max_data_per_query} characters")
-        print(f"  Max data (decoded): ~{max_data_per_query * 5 // 8} bytes")
-        print()
-        
-        # DNS response
-        txt_record_max = 255  # bytes per string
-        txt_strings_typical = 4  # Multiple strings allowed
-        max_response_data = txt_record_max * txt_strings_typical
-        
-        print(f"DNS Response (TXT record):")
-        print(f"  Max per TXT string: {txt_record_max} bytes")
-        print(f"  Typical strings: {txt_strings_typical}")
-        print(f"  Max response data: ~{max_response_data} bytes")
-        print(f"  Max response (Base64 decoded): ~{max_response_data * 3 // 4} bytes")
-        print()
-        
-        # Throughput estimation
-        self.print_subheader("Throughput Estimation")
-        
-        # Assume 100ms round-trip time (typical for DNS)
-        rtt_ms = 100
-        queries_per_second = 1000 / rtt_ms
-        
-        upload_bytes_per_query = max_data_per_query * 5 // 8
-        download_bytes_per_query = max_response_data * 3 // 4
-        
-        upload_bps = upload_bytes_per_query * queries_per_second * 8
-        download_bps = download_bytes_per_query * queries_per_second * 8
-        
-        print(f"Assuming {rtt_ms}ms round-trip time:")
-        print(f"  Queries per second: {queries_per_second}")
-        print(f"  Upload throughput: ~{upload_bps / 1000:.1f} kbps ({upload_bytes_per_query * queries_per_second / 1024:.1f} KB/s)")
-        print(f"  Download throughput: ~{download_bps / 1000:.1f} kbps ({download_bytes_per_query * queries_per_second / 1024:.1f} KB/s)")
-        print()
-        
-        print("⚠️  This is MUCH slower than normal TCP/IP!")
-        print("   Normal internet: 10-1000+ Mbps")
-        print("   DNS tunnel: ~10-100 kbps")
-        print()
-        
-        self.results["experiments"].append({
+        # Derive every figure in one place; the report is a single template
+        stats = dict(
+            dns_header=12,  # bytes
+            dns_question_overhead=4,  # QTYPE + QCLASS
+            domain_overhead=20,  # Approximate for .tunnel.example.com
+            max_domain_length=253,
+            max_label_length=63,
+            txt_record_max=255,  # bytes per string
+            txt_strings_typical=4,  # Multiple strings allowed
+            rtt_ms=100,  # Typical DNS round-trip time
+        )
+        stats['usable_labels'] = (stats['max_domain_length'] - stats['domain_overhead']) // (stats['max_label_length'] + 1)
+        stats['max_data_per_query'] = stats['usable_labels'] * stats['max_label_length']
+        stats['max_response_data'] = stats['txt_record_max'] * stats['txt_strings_typical']
+        stats['queries_per_second'] = 1000 / stats['rtt_ms']
+        stats['upload_bytes_per_query'] = stats['max_data_per_query'] * 5 // 8
+        stats['download_bytes_per_query'] = stats['max_response_data'] * 3 // 4
+        stats['upload_kbps'] = stats['upload_bytes_per_query'] * stats['queries_per_second'] * 8 / 1000
+        stats['download_kbps'] = stats['download_bytes_per_query'] * stats['queries_per_second'] * 8 / 1000
+        stats['upload_kib_s'] = stats['upload_bytes_per_query'] * stats['queries_per_second'] / 1024
+        stats['download_kib_s'] = stats['download_bytes_per_query'] * stats['queries_per_second'] / 1024
+        
+        sys.stdout.write(_PERFORMANCE_REPORT.format_map(stats))
+        
+        self.record({
             "name": "Performance Analysis",
-            "max_data_per_query": upload_bytes_per_query,
-            "max_data_per_response": download_bytes_per_query,
-            "estimated_upload_kbps": upload_bps / 1000,
-            "estimated_download_kbps": download_bps / 1000
+            "max_data_per_query": stats['upload_bytes_per_query'],
+            "max_data_per_response": stats['download_bytes_per_query'],
+            "estimated_upload_kbps": stats['upload_kbps'],
+            "estimated_download_kbps": stats['download_kbps']
         })
     
-    def save_results(self, filepath: str):
-        """Save results to JSON file"""
-        with open(filepath, 'w') as f:
-            json.dump(self.results, f, indent=2)
-        print(f"✓ Results saved to: {filepath}")
+    def _close(self):
+        """Close out the JSON document in the temp file (once)"""
+        if not self.results_file.closed:
+            self.results_file.write("\n  ]\n}" if self.record_count else "]\n}")
+            self.results_file.close()
+    
+    def _commit(self):
+        """Move the finished temp file over the previous results"""
+        os.replace(self.tmp_filepath, self.filepath)
+        print(f"✓ Results saved to: {self.filepath}")
+    
+    def save_results(self):
+        """Close out the JSON document and move it into place"""
+        self._close()
+        self._commit()
+    
+    def discard_results(self):
+        """Release the temp file of a run that didn't finish; no-op once saved"""
+        self._close()
+        try:
+            os.remove(self.tmp_filepath)
+        except FileNotFoundError:
+            pass
 
 
 def main():
@@ -554,15 +669,23 @@ def main():
     print("Can we tunnel TCP/IP traffic through DNS queries?")
     print("=" * 70)
     
-    experiment = DNSTunnelExperiment()
+    evidence_dir = "/home/ubuntu/unknown-unknown-experiments/experiments/007-dns-tunnel/evidence"
+    experiment = DNSTunnelExperiment(f"{evidence_dir}/experiment_data.json")
     
-    # Run all experiments
-    experiment.experiment_1_dns_query_structure()
-    experiment.experiment_2_data_encoding()
-    experiment.experiment_3_dns_response_data()
-    experiment.experiment_4_bidirectional_tunnel()
-    experiment.experiment_5_real_dns_tunnel_test()
-    experiment.experiment_6_performance_analysis()
+    # Only a run in which all six experiments returned replaces the
+    # previous results; otherwise (an error, Ctrl-C) the partial document is
+    # closed and discarded, and the previous results are left untouched
+    try:
+        # Run all experiments
+        experiment.experiment_1_dns_query_structure()
+        experiment.experiment_2_data_encoding()
+        experiment.experiment_3_dns_response_data()
+        experiment.experiment_4_bidirectional_tunnel()
+        experiment.experiment_5_real_dns_tunnel_test(verbose="--verbose" in sys.argv)
+        experiment.experiment_6_performance_analysis()
+        experiment.save_results()
+    finally:
+        experiment.discard_results()
     
     # Summary
     experiment.print_header("EXPERIMENT SUMMARY")
@@ -600,10 +723,6 @@ def main():
     print("Confidence: 🟢 CONFIRMED")
     print("=" * 70)
     
-    # Save results
-    evidence_dir = "/home/ubuntu/unknown-unknown-experiments/experiments/007-dns-tunnel/evidence"
-    experiment.save_results(f"{evidence_dir}/experiment_data.json")
-    
     print()
     print("✓ Experiment complete!")
     print("✓ Check the evidence/ folder for saved data")
@@ -7,20 +7,80 @@ This uses actual quantum superposition and measurement to generate
 truly random bits, not pseudo-random algorithms.
 """
 
-import requests
+import urllib3
+import fcntl
 import hashlib
 import json
+import os
+import threading
 import time
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
 
-def get_quantum_random_bits(num_bits=256):
+# Optional: BLAKE3 outpaces SHA-256 on bulk input; only used for large samples
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# Optional: scipy's regularized upper incomplete gamma (NIST's igamc) gives
+# the Block Frequency p-value; without it only the statistic is reported
+try:
+    from scipy.special import gammaincc
+except ImportError:
+    gammaincc = None
+
+# orjson parses and serializes in native code when available; stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# hashlib only uses OpenSSL's SHA-256 (SHA-NI where the CPU has it) when
+# linked against it; otherwise it falls back to a slower builtin
+OPENSSL_SHA256 = hashlib.sha256.__module__ == '_hashlib'
+BLAKE3_MIN_BYTES = 4 * 1024
+
+# Block Frequency test block size in bits (NIST SP 800-22 section 2.2)
+BLOCK_BITS = 128
+
+# Local pool of fetched quantum bytes; the ANU API serves at most 1024 per call
+POOL_FILE = os.path.expanduser('~/.cache/quantum_keygen/pool.bin')
+ANU_MAX_BYTES = 1024
+REFILL_WAIT_S = 15
+
+# Shared connection pool: repeated fetches reuse the TLS connection. Retries
+# are bounded, and split connect/read timeouts make a hung endpoint fail fast
+_POOL = urllib3.PoolManager(maxsize=4, retries=urllib3.Retry(total=2, connect=2, read=1, backoff_factor=0.2,
+                                                             status_forcelist=(502, 503, 504)))
+_TIMEOUT = urllib3.Timeout(connect=3, read=10)
+
+def _now_iso():
+    """Wall-clock timestamp for log lines and evidence, in ISO format"""
+    return datetime.now().isoformat()
+
+def to_bit_string(data):
+    """Render bytes as a '0'/'1' string, only where bits are displayed"""
+    return format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b')
+
+def print_preview(data, out=print):
+    """Print the leading bits and bytes of a sample from one 16-byte slice"""
+    head = data[:16]
+    out(f"First 64 bits (binary): {to_bit_string(head[:8])}")
+    out(f"First 16 bytes (hex): {head.hex()}")
+
+def get_quantum_random_bits(num_bits=256, out=print):
     """
     Get random bits from ANU Quantum Random Numbers Server
     This uses real quantum vacuum fluctuations measured by lasers
+    
+    Log lines go to `out`, so a background fetch can collect them instead
+    of printing into the middle of the foreground output.
     """
-    print(f"\n[{datetime.now().isoformat()}] Requesting {num_bits} quantum random bits...")
-    print("Source: ANU Quantum Random Numbers Server (Australian National University)")
-    print("Method: Measuring quantum vacuum fluctuations in a beam of light\n")
+    out(f"\n[{_now_iso()}] Requesting {num_bits} quantum random bits...")
+    out("Source: ANU Quantum Random Numbers Server (Australian National University)")
+    out("Method: Measuring quantum vacuum fluctuations in a beam of light\n")
     
     # ANU QRNG API - free public quantum random number generator
     url = "https://qrng.anu.edu.au/API/jsonI.php"
@@ -29,36 +89,155 @@ def get_quantum_random_bits(num_bits=256):
         "type": "uint8"
     }
     
-    print(f"API Request: {url}")
-    print(f"Parameters: {json.dumps(params, indent=2)}")
+    out(f"API Request: {url}")
+    out(f"Parameters: {json.dumps(params, indent=2)}")
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        print(f"\nHTTP Status: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print(f"\nRaw Response Body:\n{response.text}\n")
+        response = _POOL.request('GET', url, fields=params, timeout=_TIMEOUT)
+        out(f"\nHTTP Status: {response.status}")
+        out(f"Response Headers: {dict(response.headers)}")
+        out(f"\nRaw Response Body:\n{response.data.decode(errors='replace')}\n")
         
-        response.raise_for_status()
-        data = response.json()
+        if response.status >= 400:
+            raise Exception(f"HTTP {response.status} from {url}")
+        data = orjson.loads(response.data) if orjson is not None else json.loads(response.data)
         
         if not data.get('success'):
             raise Exception(f"API returned success=false: {data}")
         
-        # Convert the random bytes to bits
+        # The bytes are the bits; no '0'/'1' string is built
         random_bytes = bytes(data['data'])
-        random_bits = ''.join(format(byte, '08b') for byte in random_bytes)
         
-        print(f"✓ Successfully received {len(random_bits)} quantum random bits")
-        print(f"First 64 bits (binary): {random_bits[:64]}")
-        print(f"First 16 bytes (hex): {random_bytes[:16].hex()}")
+        out(f"✓ Successfully received {len(random_bytes) * 8} quantum random bits")
+        print_preview(random_bytes)
         
-        return random_bits[:num_bits], random_bytes
+        return random_bytes[:num_bits // 8]
         
     except Exception as e:
-        print(f"\n✗ ERROR: {type(e).__name__}: {str(e)}")
+        out(f"\n✗ ERROR: {type(e).__name__}: {str(e)}")
         raise
 
-def generate_crypto_keys(quantum_bits, quantum_bytes):
+class QRNGCache:
+    """
+    File-backed pool of quantum random bytes
+    
+    take() hands out bytes from the pool and removes them under an exclusive
+    flock on a sibling lock file, so no byte is used twice, even by
+    concurrent runs sharing the pool. When the pool drops below `low`, a
+    background thread refills it up to `high` from the QRNG; a second lock
+    file lets only one run refill at a time, and the pool is never stocked
+    past `high`. A cold pool is filled by a single synchronous fetch, so
+    only one API call is in flight. The refill's log is collected and
+    printed by wait_for_refill(), not interleaved with the caller's output.
+    """
+    
+    def __init__(self, path=POOL_FILE, low=256, high=ANU_MAX_BYTES):
+        self.path = path
+        self.low = low
+        self.high = high
+        self._refill_thread = None
+        self._refill_log = []
+    
+    @contextmanager
+    def _locked(self, suffix='lock', blocking=True):
+        """Hold an exclusive flock on a sibling lock file (`.lock` guards the
+        pool across read, slice and write; `.refill` marks a refill in flight)
+        
+        Non-blocking, it yields False instead of waiting when the lock is taken.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(f"{self.path}.{suffix}", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+            else:
+                yield True
+        finally:
+            os.close(fd)
+    
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return b''
+    
+    def _write(self, data):
+        """Replace the pool atomically, readable only by its owner"""
+        tmp = f"{self.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+    
+    def _stock(self, fetched):
+        """Append fetched bytes to the pool, up to `high`; call under the lock"""
+        pool = self._read()
+        self._write(pool + fetched[:max(0, self.high - len(pool))])
+    
+    def take(self, n):
+        """Return n fresh bytes, from the pool when it holds enough"""
+        with self._locked():
+            pool = self._read()
+            if len(pool) >= n:
+                self._write(pool[n:])
+                remaining = len(pool) - n
+            else:
+                remaining = None
+        
+        if remaining is not None:
+            print(f"✓ Took {n} quantum random bytes from the local pool ({remaining} left)")
+            if remaining < self.low:
+                self._start_refill()
+            return pool[:n]
+        
+        # Cold pool: one fetch serves this call and stocks the pool
+        fetched = get_quantum_random_bits(num_bits=max(n, self.high) * 8)
+        with self._locked():
+            self._stock(fetched[n:])
+        return fetched[:n]
+    
+    def _start_refill(self):
+        if self._refill_thread is not None and self._refill_thread.is_alive():
+            return
+        # Daemon: an unfinished refill never keeps the process alive
+        self._refill_thread = threading.Thread(target=self._refill, name='qrng-refill', daemon=True)
+        self._refill_thread.start()
+    
+    def wait_for_refill(self, timeout=None):
+        """Give a running refill up to `timeout` seconds to land, then print its log"""
+        if self._refill_thread is None:
+            return
+        self._refill_thread.join(timeout)
+        if self._refill_thread.is_alive():
+            print(f"Pool refill still in flight after {timeout}s; abandoning it")
+            return
+        if self._refill_log:
+            print("\n[Background pool refill]")
+            print("\n".join(self._refill_log))
+    
+    def _refill(self):
+        log = self._refill_log
+        try:
+            # Only one run refills at a time; the others skip rather than
+            # fetch the same top-up again
+            with self._locked('refill', blocking=False) as acquired:
+                if not acquired:
+                    log.append("Pool refill already in progress in another run")
+                    return
+                with self._locked():
+                    missing = self.high - len(self._read())
+                if missing <= 0:
+                    return
+                fetched = get_quantum_random_bits(num_bits=min(missing, ANU_MAX_BYTES) * 8, out=log.append)
+                with self._locked():
+                    self._stock(fetched)
+        except Exception as e:
+            log.append(f"✗ Pool refill failed: {type(e).__name__}: {e}")
+
+def generate_crypto_keys(quantum_bytes):
     """
     Generate various cryptographic keys from quantum random data
     """
@@ -73,7 +252,7 @@ def generate_crypto_keys(quantum_bits, quantum_bytes):
     keys['aes256'] = aes_key.hex()
     print(f"AES-256 Key (32 bytes):")
     print(f"  Hex: {keys['aes256']}")
-    print(f"  Binary: {quantum_bits[:256][:64]}... (truncated)")
+    print(f"  Binary: {to_bit_string(aes_key[:8])}... (truncated)")
     print()
     
     # 2. SHA-256 Hash of quantum data (can be used as a key)
@@ -83,6 +262,13 @@ def generate_crypto_keys(quantum_bits, quantum_bytes):
     print(f"  Hex: {keys['sha256_derived']}")
     print()
     
+    # 2b. BLAKE3 over large quantum samples
+    if blake3 is not None and len(quantum_bytes) >= BLAKE3_MIN_BYTES:
+        keys['blake3_derived'] = blake3.blake3(quantum_bytes).hexdigest()
+        print(f"BLAKE3 Derived Key:")
+        print(f"  Hex: {keys['blake3_derived']}")
+        print()
+    
     # 3. Simulated RSA seed (in practice you'd use this with a proper RSA library)
     rsa_seed = quantum_bytes[:64]
     keys['rsa_seed'] = rsa_seed.hex()
@@ -91,14 +277,7 @@ def generate_crypto_keys(quantum_bits, quantum_bytes):
     print()
     
     # 4. UUID-like identifier
-    uuid_bytes = quantum_bytes[:16]
-    uuid_str = '-'.join([
-        uuid_bytes[0:4].hex(),
-        uuid_bytes[4:6].hex(),
-        uuid_bytes[6:8].hex(),
-        uuid_bytes[8:10].hex(),
-        uuid_bytes[10:16].hex()
-    ])
+    uuid_str = str(uuid.UUID(bytes=bytes(quantum_bytes[:16])))
     keys['quantum_uuid'] = uuid_str
     print(f"Quantum UUID:")
     print(f"  {uuid_str}")
@@ -106,7 +285,7 @@ def generate_crypto_keys(quantum_bits, quantum_bytes):
     
     return keys
 
-def verify_randomness(bits):
+def verify_randomness(quantum_bytes):
     """
     Basic statistical tests to verify randomness quality
     """
@@ -114,10 +293,10 @@ def verify_randomness(bits):
     print("RANDOMNESS QUALITY TESTS")
     print("="*70 + "\n")
     
-    # Count 0s and 1s
-    ones = bits.count('1')
-    zeros = bits.count('0')
-    total = len(bits)
+    # Count 0s and 1s with a single popcount over the whole sample
+    total = len(quantum_bytes) * 8
+    ones = int.from_bytes(quantum_bytes, 'big').bit_count()
+    zeros = total - ones
     
     print(f"Bit Distribution:")
     print(f"  Total bits: {total}")
@@ -131,17 +310,35 @@ def verify_randomness(bits):
     print(f"\nChi-Square Statistic: {chi_square:.4f}")
     print(f"  (Lower is better, <3.84 indicates good randomness at 95% confidence)")
     
-    # Check for obvious patterns
-    print(f"\nPattern Check:")
-    print(f"  '00000000' appears: {bits.count('00000000')} times")
-    print(f"  '11111111' appears: {bits.count('11111111')} times")
-    print(f"  '01010101' appears: {bits.count('01010101')} times")
-    print(f"  '10101010' appears: {bits.count('10101010')} times")
+    # Block Frequency test: proportion of ones within each 128-bit block,
+    # one popcount per block
+    block_bytes = BLOCK_BITS // 8
+    num_blocks = len(quantum_bytes) // block_bytes
+    block_chi_square = 4 * BLOCK_BITS * sum(
+        (int.from_bytes(quantum_bytes[i:i + block_bytes], 'big').bit_count() / BLOCK_BITS - 0.5) ** 2
+        for i in range(0, num_blocks * block_bytes, block_bytes)
+    )
+    block_p_value = None
+    if gammaincc is not None and num_blocks:
+        block_p_value = float(gammaincc(num_blocks / 2, block_chi_square / 2))
+    print(f"\nBlock Frequency Test ({num_blocks} blocks of {BLOCK_BITS} bits):")
+    print(f"  Chi-Square: {block_chi_square:.4f}")
+    if block_p_value is not None:
+        print(f"  P-value: {block_p_value:.4f} (>= 0.01 passes)")
+    
+    # Check for obvious patterns (byte-aligned)
+    print(f"\nPattern Check (whole bytes):")
+    print(f"  '00000000' appears: {quantum_bytes.count(0x00)} times")
+    print(f"  '11111111' appears: {quantum_bytes.count(0xff)} times")
+    print(f"  '01010101' appears: {quantum_bytes.count(0x55)} times")
+    print(f"  '10101010' appears: {quantum_bytes.count(0xaa)} times")
     
     return {
         'ones': ones,
         'zeros': zeros,
         'chi_square': chi_square,
+        'block_chi_square': block_chi_square,
+        'block_p_value': block_p_value,
         'ratio': ones/zeros if zeros > 0 else float('inf')
     }
 
@@ -149,35 +346,45 @@ def main():
     print("="*70)
     print("QUANTUM RANDOM NUMBER CRYPTOGRAPHIC KEY GENERATION")
     print("="*70)
-    print(f"Start Time: {datetime.now().isoformat()}")
+    print(f"Start Time: {_now_iso()}")
+    if not OPENSSL_SHA256:
+        print("Note: hashlib is not backed by OpenSSL; SHA-256 uses the slow builtin")
     print()
     
-    # Get quantum random bits
-    quantum_bits, quantum_bytes = get_quantum_random_bits(num_bits=512)
+    # Get quantum random bits, from the local pool when it is warm
+    cache = QRNGCache()
+    quantum_bytes = cache.take(512 // 8)
     
     # Generate cryptographic keys
-    keys = generate_crypto_keys(quantum_bits, quantum_bytes)
+    keys = generate_crypto_keys(quantum_bytes)
     
     # Verify randomness quality
-    stats = verify_randomness(quantum_bits)
+    stats = verify_randomness(quantum_bytes)
     
     # Save evidence
     evidence = {
-        'timestamp': datetime.now().isoformat(),
-        'quantum_bits_sample': quantum_bits[:256],
+        'timestamp': _now_iso(),
+        'quantum_bits_sample': to_bit_string(quantum_bytes[:32]),
         'quantum_bytes_hex': quantum_bytes.hex(),
         'keys': keys,
         'randomness_stats': stats
     }
     
     evidence_file = '../evidence/quantum_keys.json'
-    with open(evidence_file, 'w') as f:
-        json.dump(evidence, f, indent=2)
+    if orjson is not None:
+        with open(evidence_file, 'wb') as f:
+            f.write(orjson.dumps(evidence, option=orjson.OPT_INDENT_2))
+    else:
+        with open(evidence_file, 'w') as f:
+            json.dump(evidence, f, indent=2)
     
     print("\n" + "="*70)
     print(f"✓ Evidence saved to: {evidence_file}")
     print("="*70)
-    print(f"\nEnd Time: {datetime.now().isoformat()}")
+    print(f"\nEnd Time: {_now_iso()}")
+    
+    # A background refill gets a bounded chance to land before exit
+    cache.wait_for_refill(timeout=REFILL_WAIT_S)
     
     return evidence
 
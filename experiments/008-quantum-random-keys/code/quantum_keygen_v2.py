@@ -8,21 +8,53 @@ import requests
 import hashlib
 import json
 import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 import urllib3
+from urllib3.util.retry import Retry
+
+# orjson parses the API responses in native code when available; stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Disable SSL warnings for expired certs (we'll document this!)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# Shared session: the sources are fetched concurrently through one
+# connection pool, and retries reuse the kept-alive connection. Retries are
+# bounded and only cover connection failures, one read, and gateway errors
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=4,
+                                      max_retries=Retry(total=2, connect=2, read=1, backoff_factor=0.2,
+                                                        status_forcelist=(502, 503, 504))))
+
+# (connect, read) timeouts in seconds: a hung endpoint fails fast
+TIMEOUT = (3, 10)
+
+def to_bit_string(data):
+    """Render bytes as a '0'/'1' string in one bignum conversion"""
+    return format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b')
+
+def preview_lines(data):
+    """Leading bits and bytes of a sample, rendered from one 16-byte slice"""
+    head = data[:16]
+    return [f"First 64 bits (binary): {to_bit_string(head[:8])}",
+            f"First 16 bytes (hex): {head.hex()}"]
+
 def get_quantum_random_anu(num_bits=256):
     """
     Attempt 1: ANU Quantum Random Numbers Server
     Uses quantum vacuum fluctuations measured by lasers
     """
-    print(f"\n[ATTEMPT 1: ANU QRNG]")
-    print(f"[{datetime.now().isoformat()}] Requesting {num_bits} quantum random bits...")
-    print("Source: ANU Quantum Random Numbers Server (Australian National University)")
-    print("Method: Measuring quantum vacuum fluctuations in a beam of light\n")
+    log = []
+    log.append(f"\n[ATTEMPT 1: ANU QRNG]")
+    log.append(f"[{datetime.now().isoformat()}] Requesting {num_bits} quantum random bits...")
+    log.append("Source: ANU Quantum Random Numbers Server (Australian National University)")
+    log.append("Method: Measuring quantum vacuum fluctuations in a beam of light\n")
     
     url = "https://qrng.anu.edu.au/API/jsonI.php"
     params = {
@@ -30,57 +62,68 @@ def get_quantum_random_anu(num_bits=256):
         "type": "uint8"
     }
     
-    print(f"API Request: {url}")
-    print(f"Parameters: {json.dumps(params, indent=2)}")
+    log.append(f"API Request: {url}")
+    log.append(f"Parameters: {json.dumps(params, indent=2)}")
     
     try:
-        # Try with SSL verification disabled due to expired cert
-        response = requests.get(url, params=params, timeout=30, verify=False)
-        print(f"\nHTTP Status: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print(f"\nRaw Response Body:\n{response.text}\n")
+        # Verify the certificate; ANU's has expired before, so only then
+        # fall back to an unverified request (documented in the README).
+        # Any other TLS failure fails this source like any other error, and
+        # the downgrade is carried into the evidence
+        tls_verified = True
+        try:
+            response = SESSION.get(url, params=params, timeout=TIMEOUT)
+        except requests.exceptions.SSLError as e:
+            if 'certificate has expired' not in str(e):
+                raise
+            log.append(f"\nCertificate verification failed: {e}")
+            log.append("⚠ Certificate has expired - retrying with SSL verification disabled")
+            response = SESSION.get(url, params=params, timeout=TIMEOUT, verify=False)
+            tls_verified = False
+        log.append(f"\nHTTP Status: {response.status_code}")
+        log.append(f"Response Headers: {dict(response.headers)}")
+        log.append(f"\nRaw Response Body:\n{response.text}\n")
         
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content) if orjson is not None else response.json()
         
         if not data.get('success'):
             raise Exception(f"API returned success=false: {data}")
         
         random_bytes = bytes(data['data'])
-        random_bits = ''.join(format(byte, '08b') for byte in random_bytes)
         
-        print(f"✓ SUCCESS! Received {len(random_bits)} quantum random bits from ANU")
-        print(f"First 64 bits (binary): {random_bits[:64]}")
-        print(f"First 16 bytes (hex): {random_bytes[:16].hex()}")
+        log.append(f"✓ SUCCESS! Received {len(random_bytes) * 8} quantum random bits from ANU")
+        log.extend(preview_lines(random_bytes))
         
-        return random_bits[:num_bits], random_bytes, "ANU_QRNG"
+        return random_bytes[:num_bits // 8], "ANU_QRNG", tls_verified, log
         
     except Exception as e:
-        print(f"\n✗ FAILED: {type(e).__name__}: {str(e)}")
-        return None, None, None
+        log.append(f"\n✗ FAILED: {type(e).__name__}: {str(e)}")
+        return None, None, None, log
 
 def get_quantum_random_qrandom(num_bits=256):
     """
     Attempt 2: QRANDOM.net - Another quantum random number service
     """
-    print(f"\n[ATTEMPT 2: QRANDOM.net]")
-    print(f"[{datetime.now().isoformat()}] Requesting {num_bits} quantum random bits...")
-    print("Source: QRANDOM.net")
-    print("Method: Quantum random number generation\n")
+    log = []
+    log.append(f"\n[ATTEMPT 2: QRANDOM.net]")
+    log.append(f"[{datetime.now().isoformat()}] Requesting {num_bits} quantum random bits...")
+    log.append("Source: QRANDOM.net")
+    log.append("Method: Quantum random number generation\n")
     
     num_bytes = num_bits // 8
     url = f"https://qrandom.net/api/v1/random/bytes/{num_bytes}"
     
-    print(f"API Request: {url}")
+    log.append(f"API Request: {url}")
     
     try:
-        response = requests.get(url, timeout=30)
-        print(f"\nHTTP Status: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print(f"\nRaw Response Body:\n{response.text}\n")
+        response = SESSION.get(url, timeout=TIMEOUT)
+        log.append(f"\nHTTP Status: {response.status_code}")
+        log.append(f"Response Headers: {dict(response.headers)}")
+        log.append(f"\nRaw Response Body:\n{response.text}\n")
         
         response.raise_for_status()
-        data = response.json()
+        data = orjson.loads(response.content) if orjson is not None else response.json()
         
         if not data.get('success'):
             raise Exception(f"API returned success=false: {data}")
@@ -88,27 +131,26 @@ def get_quantum_random_qrandom(num_bits=256):
         # The API returns base64 encoded data
         import base64
         random_bytes = base64.b64decode(data['data'])
-        random_bits = ''.join(format(byte, '08b') for byte in random_bytes)
         
-        print(f"✓ SUCCESS! Received {len(random_bits)} quantum random bits from QRANDOM")
-        print(f"First 64 bits (binary): {random_bits[:64]}")
-        print(f"First 16 bytes (hex): {random_bytes[:16].hex()}")
+        log.append(f"✓ SUCCESS! Received {len(random_bytes) * 8} quantum random bits from QRANDOM")
+        log.extend(preview_lines(random_bytes))
         
-        return random_bits[:num_bits], random_bytes, "QRANDOM"
+        return random_bytes[:num_bits // 8], "QRANDOM", True, log
         
     except Exception as e:
-        print(f"\n✗ FAILED: {type(e).__name__}: {str(e)}")
-        return None, None, None
+        log.append(f"\n✗ FAILED: {type(e).__name__}: {str(e)}")
+        return None, None, None, log
 
 def get_quantum_random_randomorg(num_bits=256):
     """
     Attempt 3: Random.org - Uses atmospheric noise (not quantum, but true random)
     Fallback option to show contrast with quantum sources
     """
-    print(f"\n[ATTEMPT 3: Random.org (Atmospheric Noise - NOT quantum)]")
-    print(f"[{datetime.now().isoformat()}] Requesting {num_bits} random bits...")
-    print("Source: Random.org")
-    print("Method: Atmospheric noise (radio receivers)\n")
+    log = []
+    log.append(f"\n[ATTEMPT 3: Random.org (Atmospheric Noise - NOT quantum)]")
+    log.append(f"[{datetime.now().isoformat()}] Requesting {num_bits} random bits...")
+    log.append("Source: Random.org")
+    log.append("Method: Atmospheric noise (radio receivers)\n")
     
     num_bytes = num_bits // 8
     url = "https://www.random.org/cgi-bin/randbyte"
@@ -117,33 +159,31 @@ def get_quantum_random_randomorg(num_bits=256):
         "format": "h"  # hex format
     }
     
-    print(f"API Request: {url}")
-    print(f"Parameters: {json.dumps(params, indent=2)}")
+    log.append(f"API Request: {url}")
+    log.append(f"Parameters: {json.dumps(params, indent=2)}")
     
     try:
-        response = requests.get(url, params=params, timeout=30)
-        print(f"\nHTTP Status: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print(f"\nRaw Response Body:\n{response.text}\n")
+        response = SESSION.get(url, params=params, timeout=TIMEOUT)
+        log.append(f"\nHTTP Status: {response.status_code}")
+        log.append(f"Response Headers: {dict(response.headers)}")
+        log.append(f"\nRaw Response Body:\n{response.text}\n")
         
         response.raise_for_status()
         
         # Parse hex response
         hex_data = response.text.strip().replace('\n', '').replace('\t', '').replace(' ', '')
         random_bytes = bytes.fromhex(hex_data)
-        random_bits = ''.join(format(byte, '08b') for byte in random_bytes)
         
-        print(f"✓ SUCCESS! Received {len(random_bits)} atmospheric random bits from Random.org")
-        print(f"First 64 bits (binary): {random_bits[:64]}")
-        print(f"First 16 bytes (hex): {random_bytes[:16].hex()}")
+        log.append(f"✓ SUCCESS! Received {len(random_bytes) * 8} atmospheric random bits from Random.org")
+        log.extend(preview_lines(random_bytes))
         
-        return random_bits[:num_bits], random_bytes, "RANDOM_ORG_ATMOSPHERIC"
+        return random_bytes[:num_bits // 8], "RANDOM_ORG_ATMOSPHERIC", True, log
         
     except Exception as e:
-        print(f"\n✗ FAILED: {type(e).__name__}: {str(e)}")
-        return None, None, None
+        log.append(f"\n✗ FAILED: {type(e).__name__}: {str(e)}")
+        return None, None, None, log
 
-def generate_crypto_keys(quantum_bits, quantum_bytes, source):
+def generate_crypto_keys(quantum_bytes, source):
     """
     Generate various cryptographic keys from quantum random data
     """
@@ -158,7 +198,7 @@ def generate_crypto_keys(quantum_bits, quantum_bytes, source):
     keys['aes256'] = aes_key.hex()
     print(f"AES-256 Key (32 bytes):")
     print(f"  Hex: {keys['aes256']}")
-    print(f"  Binary: {quantum_bits[:256][:64]}... (truncated)")
+    print(f"  Binary: {to_bit_string(aes_key[:8])}... (truncated)")
     print()
     
     # 2. SHA-256 Hash of quantum data
@@ -176,14 +216,7 @@ def generate_crypto_keys(quantum_bits, quantum_bytes, source):
     print()
     
     # 4. UUID-like identifier
-    uuid_bytes = quantum_bytes[:16]
-    uuid_str = '-'.join([
-        uuid_bytes[0:4].hex(),
-        uuid_bytes[4:6].hex(),
-        uuid_bytes[6:8].hex(),
-        uuid_bytes[8:10].hex(),
-        uuid_bytes[10:16].hex()
-    ])
+    uuid_str = str(uuid.UUID(bytes=bytes(quantum_bytes[:16])))
     keys['quantum_uuid'] = uuid_str
     print(f"Quantum UUID:")
     print(f"  {uuid_str}")
@@ -191,7 +224,7 @@ def generate_crypto_keys(quantum_bits, quantum_bytes, source):
     
     return keys
 
-def verify_randomness(bits, source):
+def verify_randomness(quantum_bytes, source):
     """
     Basic statistical tests to verify randomness quality
     """
@@ -199,9 +232,10 @@ def verify_randomness(bits, source):
     print(f"RANDOMNESS QUALITY TESTS - {source}")
     print("="*70 + "\n")
     
-    ones = bits.count('1')
-    zeros = bits.count('0')
-    total = len(bits)
+    # Count 0s and 1s with a single popcount over the whole sample
+    total = len(quantum_bytes) * 8
+    ones = int.from_bytes(quantum_bytes, 'big').bit_count()
+    zeros = total - ones
     
     print(f"Bit Distribution:")
     print(f"  Total bits: {total}")
@@ -214,11 +248,11 @@ def verify_randomness(bits, source):
     print(f"\nChi-Square Statistic: {chi_square:.4f}")
     print(f"  (Lower is better, <3.84 indicates good randomness at 95% confidence)")
     
-    print(f"\nPattern Check:")
-    print(f"  '00000000' appears: {bits.count('00000000')} times")
-    print(f"  '11111111' appears: {bits.count('11111111')} times")
-    print(f"  '01010101' appears: {bits.count('01010101')} times")
-    print(f"  '10101010' appears: {bits.count('10101010')} times")
+    print(f"\nPattern Check (whole bytes):")
+    print(f"  '00000000' appears: {quantum_bytes.count(0x00)} times")
+    print(f"  '11111111' appears: {quantum_bytes.count(0xff)} times")
+    print(f"  '01010101' appears: {quantum_bytes.count(0x55)} times")
+    print(f"  '10101010' appears: {quantum_bytes.count(0xaa)} times")
     
     return {
         'ones': ones,
@@ -241,35 +275,61 @@ def main():
         get_quantum_random_randomorg
     ]
     
-    quantum_bits = None
     quantum_bytes = None
     source_name = None
+    tls_verified = None
     
-    for source_func in sources:
-        bits, bytes_data, name = source_func(num_bits=512)
-        if bits is not None:
-            quantum_bits = bits
-            quantum_bytes = bytes_data
-            source_name = name
-            break
+    # All sources are requested at once; the first one that succeeds in
+    # priority order is used, so a quantum source wins over Random.org.
+    # Each fetcher returns its log instead of printing, so concurrent
+    # attempts don't interleave: the chosen source's log is printed in full,
+    # a failed higher-priority source only by its failure line.
+    # Lower-priority fetches still in flight are not cancelled (running
+    # threads can't be); key generation starts without them, but the
+    # process still waits for them (bounded by TIMEOUT and the retry
+    # policy) before it exits
+    executor = ThreadPoolExecutor(max_workers=len(sources))
+    try:
+        futures = [executor.submit(source_func, num_bits=512) for source_func in sources]
+        logs = []
+        for future in futures:
+            bytes_data, name, verified, log = future.result()
+            logs.append(log)
+            if bytes_data is not None:
+                quantum_bytes = bytes_data
+                source_name = name
+                tls_verified = verified
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
     
-    if quantum_bits is None:
+    if quantum_bytes is None:
+        for log in logs:
+            print("\n".join(log))
         print("\n" + "="*70)
         print("✗ ALL SOURCES FAILED - Cannot complete experiment")
         print("="*70)
         return None
     
+    for log in logs[:-1]:
+        print(log[-1])
+    print("\n".join(logs[-1]))
+    
     # Generate cryptographic keys
-    keys = generate_crypto_keys(quantum_bits, quantum_bytes, source_name)
+    keys = generate_crypto_keys(quantum_bytes, source_name)
+    if not tls_verified:
+        print(f"⚠ WARNING: {source_name} was fetched WITHOUT TLS certificate verification")
+        print("  (its certificate had expired); these keys are not fit for real use")
     
     # Verify randomness quality
-    stats = verify_randomness(quantum_bits, source_name)
+    stats = verify_randomness(quantum_bytes, source_name)
     
     # Save evidence
     evidence = {
         'timestamp': datetime.now().isoformat(),
         'source': source_name,
-        'quantum_bits_sample': quantum_bits[:256],
+        'tls_verified': tls_verified,
+        'quantum_bits_sample': to_bit_string(quantum_bytes[:32]),
         'quantum_bytes_hex': quantum_bytes.hex(),
         'keys': keys,
         'randomness_stats': stats
@@ -6,8 +6,19 @@ Using whitespace steganography to embed encrypted messages in valid Python progr
 
 import sys
 import base64
+import logging
 import hashlib
-from typing import Tuple
+from functools import lru_cache
+from types import CodeType
+from typing import Optional, Tuple
+
+# Encode/decode trace lines go through logging, so library callers pay
+# nothing for them unless DEBUG is enabled
+log = logging.getLogger(__name__)
+
+# Each whitespace mark carries one bit: space = 0, tab = 1
+_BITS_TO_MARKS = str.maketrans('01', ' \t')
+_MARKS_TO_BITS = str.maketrans(' \t', '01')
 
 def encode_message_in_code(source_code: str, secret_message: str) -> str:
     """
@@ -20,35 +31,28 @@ def encode_message_in_code(source_code: str, secret_message: str) -> str:
     """
     # Encrypt the message with XOR (simple but demonstrates the concept)
     key = "QUANTUM_KEY_2026"
-    encrypted = xor_encrypt(secret_message, key)
+    encrypted = xor_bytes(secret_message.encode('utf-8'), key.encode('utf-8'))
     
-    # Convert to binary
-    binary_data = ''.join(format(byte, '08b') for byte in encrypted.encode('utf-8'))
+    # Convert to binary in one bignum-to-string conversion
+    binary_data = format(int.from_bytes(encrypted, 'big'), f'0{len(encrypted) * 8}b')
     
-    print(f"[ENCODE] Original message: {secret_message}")
-    print(f"[ENCODE] Message length: {len(secret_message)} chars")
-    print(f"[ENCODE] Encrypted: {encrypted}")
-    print(f"[ENCODE] Binary length: {len(binary_data)} bits")
-    print(f"[ENCODE] Binary (first 64 bits): {binary_data[:64]}")
+    log.debug("[ENCODE] Original message: %s", secret_message)
+    log.debug("[ENCODE] Message length: %s chars", len(secret_message))
+    log.debug("[ENCODE] Encrypted: %r", encrypted)
+    log.debug("[ENCODE] Binary length: %s bits", len(binary_data))
+    log.debug("[ENCODE] Binary (first 64 bits): %s", binary_data[:64])
     
     # Split code into lines
     lines = source_code.split('\n')
     
-    # Embed binary data as whitespace after each line
-    modified_lines = []
-    bit_index = 0
-    
-    for line in lines:
-        if bit_index < len(binary_data):
-            # Add invisible whitespace encoding
-            if binary_data[bit_index] == '1':
-                line = line + '\t'  # Tab = 1
-            else:
-                line = line + ' '   # Space = 0
-            bit_index += 1
-        modified_lines.append(line)
+    # Embed binary data as whitespace after each line: the whole bit string
+    # is mapped to marks in one translate, then one mark is appended per line
+    marks = binary_data.translate(_BITS_TO_MARKS)
+    bit_index = min(len(marks), len(lines))
+    modified_lines = [line + mark for line, mark in zip(lines, marks)]
+    modified_lines += lines[bit_index:]
     
-    print(f"[ENCODE] Embedded {bit_index} bits across {len(modified_lines)} lines")
+    log.debug("[ENCODE] Embedded %s bits across %s lines", bit_index, len(modified_lines))
     
     return '\n'.join(modified_lines)
 
@@ -59,55 +63,56 @@ def decode_message_from_code(stego_code: str) -> str:
     lines = stego_code.split('\n')
     
     # Extract binary data from trailing whitespace
-    binary_data = ''
-    for line in lines:
-        if line.endswith('\t'):
-            binary_data += '1'
-        elif line.endswith(' '):
-            binary_data += '0'
+    marks = ''.join([line[-1] for line in lines if line.endswith(('\t', ' '))])
+    binary_data = marks.translate(_MARKS_TO_BITS)
     
-    print(f"[DECODE] Extracted {len(binary_data)} bits")
-    print(f"[DECODE] Binary (first 64 bits): {binary_data[:64]}")
+    log.debug("[DECODE] Extracted %s bits", len(binary_data))
+    log.debug("[DECODE] Binary (first 64 bits): %s", binary_data[:64])
     
-    # Convert binary to bytes
-    byte_data = []
-    for i in range(0, len(binary_data), 8):
-        byte = binary_data[i:i+8]
-        if len(byte) == 8:
-            byte_data.append(int(byte, 2))
+    # Convert whole bytes of binary to bytes in one conversion
+    num_bytes = len(binary_data) // 8
+    byte_data = int(binary_data[:num_bytes * 8] or '0', 2).to_bytes(num_bytes, 'big')
     
-    print(f"[DECODE] Converted to {len(byte_data)} bytes")
+    log.debug("[DECODE] Converted to %s bytes", len(byte_data))
     
-    # Convert bytes to string
-    try:
-        encrypted_message = bytes(byte_data).decode('utf-8')
-        print(f"[DECODE] Encrypted message: {encrypted_message}")
-        
-        # Decrypt
-        key = "QUANTUM_KEY_2026"
-        decrypted = xor_encrypt(encrypted_message, key)
-        
-        return decrypted
-    except Exception as e:
-        print(f"[DECODE] Error: {e}")
-        return ""
+    log.debug("[DECODE] Encrypted message: %r", byte_data)
+    
+    # Decrypt, then decode the plaintext once
+    key = "QUANTUM_KEY_2026"
+    return xor_bytes(byte_data, key.encode('utf-8')).decode('utf-8', errors='replace')
 
-def xor_encrypt(text: str, key: str) -> str:
+def xor_bytes(data: bytes, key: bytes) -> bytes:
     """Simple XOR encryption (symmetric)"""
-    result = []
-    for i, char in enumerate(text):
-        key_char = key[i % len(key)]
-        result.append(chr(ord(char) ^ ord(key_char)))
-    return ''.join(result)
+    # Tile the key to the data length and XOR both as one bignum operation
+    n = len(data)
+    tiled_key = (key * (n // len(key) + 1))[:n]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(tiled_key, 'big')).to_bytes(n, 'big')
 
-def verify_code_still_works(code: str) -> bool:
-    """Verify the steganographic code is still valid Python"""
+# Hex dump text column: printable ASCII as-is, everything else as '.'
+_DUMP_TEXT = bytes(b if 32 <= b < 127 else ord('.') for b in range(256))
+
+def hexdump(path: str, out_path: str) -> None:
+    """Write an xxd-style hex dump of a file, 16 bytes per line"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(out_path, 'w') as out:
+        for offset in range(0, len(data), 16):
+            chunk = data[offset:offset + 16]
+            text = chunk.translate(_DUMP_TEXT).decode('ascii')
+            out.write(f"{offset:08x}: {chunk.hex(' ', -2):<39}  {text}\n")
+
+@lru_cache(maxsize=4)
+def compile_code(code: str) -> Optional[CodeType]:
+    """Compile code once; the code object is reused for every check and exec"""
     try:
-        compile(code, '<string>', 'exec')
-        return True
+        return compile(code, '<string>', 'exec')
     except SyntaxError as e:
-        print(f"[VERIFY] Syntax error: {e}")
-        return False
+        log.warning("[VERIFY] Syntax error: %s", e)
+        return None
+
+def verify_code_still_works(code: str) -> bool:
+    """Verify the steganographic code is still valid Python"""
+    return compile_code(code) is not None
 
 # Sample Python program to hide message in
 SAMPLE_PROGRAM = '''def fibonacci(n):
@@ -138,6 +143,9 @@ if __name__ == "__main__":
 '''
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    log.setLevel(logging.DEBUG)
+    
     print("=" * 70)
     print("EXPERIMENT #009: STEGANOGRAPHY IN CODE")
     print("Hiding encrypted messages in working Python programs")
@@ -169,7 +177,7 @@ if __name__ == "__main__":
     print()
     
     # Save steganographic code
-    with open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_program.py', 'w') as f:
+    with open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_program.py', 'w', encoding='utf-8', newline='') as f:
         f.write(stego_code)
     print("[SAVED] Steganographic code saved to evidence/stego_program.py")
     print()
@@ -179,7 +187,7 @@ if __name__ == "__main__":
     print("-" * 70)
     if verify_code_still_works(stego_code):
         print("✓ Code is still valid Python!")
-        exec(stego_code)
+        exec(compile_code(stego_code))
     else:
         print("✗ Code is broken!")
     print("-" * 70)
@@ -227,20 +235,15 @@ if __name__ == "__main__":
     print("-" * 70)
     
     # Save original for comparison
-    with open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/original_program.py', 'w') as f:
+    with open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/original_program.py', 'w', encoding='utf-8', newline='') as f:
         f.write(SAMPLE_PROGRAM)
     
     # Create hex dump comparison
     print("Creating hex dumps for forensic analysis...")
-    import subprocess
-    
-    subprocess.run(['xxd', 
-                   '/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/original_program.py'],
-                  stdout=open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/original_hexdump.txt', 'w'))
-    
-    subprocess.run(['xxd',
-                   '/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_program.py'],
-                  stdout=open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_hexdump.txt', 'w'))
+    hexdump('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/original_program.py',
+            '/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/original_hexdump.txt')
+    hexdump('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_program.py',
+            '/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_hexdump.txt')
     
     print("✓ Hex dumps saved for comparison")
     print("✓ Both programs saved to evidence/")
@@ -6,8 +6,20 @@ Using whitespace steganography with multiple bits per line
 
 import sys
 import base64
+import logging
 import hashlib
-from typing import Tuple
+from functools import lru_cache
+from types import CodeType
+from typing import Optional, Tuple
+
+# Encode/decode trace lines go through logging, so library callers pay
+# nothing for them unless DEBUG is enabled
+log = logging.getLogger(__name__)
+
+# Each whitespace mark carries one bit: space = 0, tab = 1, so the
+# 2-char groups below are just pairs of marks
+_BITS_TO_MARKS = str.maketrans('01', ' \t')
+_MARKS_TO_BITS = str.maketrans(' \t', '01')
 
 def encode_message_in_code(source_code: str, secret_message: str) -> str:
     """
@@ -24,20 +36,21 @@ def encode_message_in_code(source_code: str, secret_message: str) -> str:
     """
     # Encrypt the message with XOR
     key = "QUANTUM_KEY_2026"
-    encrypted = xor_encrypt(secret_message, key)
+    encrypted = xor_bytes(secret_message.encode('utf-8'), key.encode('utf-8'))
     
     # Convert to base64 to handle any byte values safely
-    b64_encrypted = base64.b64encode(encrypted.encode('utf-8')).decode('ascii')
+    b64_encrypted = base64.b64encode(encrypted).decode('ascii')
     
-    # Convert to binary
-    binary_data = ''.join(format(ord(char), '08b') for char in b64_encrypted)
+    # Convert to binary in one bignum-to-string conversion
+    payload = b64_encrypted.encode('ascii')
+    binary_data = format(int.from_bytes(payload, 'big'), f'0{len(payload) * 8}b')
     
-    print(f"[ENCODE] Original message: {secret_message}")
-    print(f"[ENCODE] Message length: {len(secret_message)} chars")
-    print(f"[ENCODE] Encrypted: {encrypted}")
-    print(f"[ENCODE] Base64 encrypted: {b64_encrypted}")
-    print(f"[ENCODE] Binary length: {len(binary_data)} bits")
-    print(f"[ENCODE] Binary (first 64 bits): {binary_data[:64]}")
+    log.debug("[ENCODE] Original message: %s", secret_message)
+    log.debug("[ENCODE] Message length: %s chars", len(secret_message))
+    log.debug("[ENCODE] Encrypted: %r", encrypted)
+    log.debug("[ENCODE] Base64 encrypted: %s", b64_encrypted)
+    log.debug("[ENCODE] Binary length: %s bits", len(binary_data))
+    log.debug("[ENCODE] Binary (first 64 bits): %s", binary_data[:64])
     
     # Split code into lines
     lines = source_code.split('\n')
@@ -45,43 +58,19 @@ def encode_message_in_code(source_code: str, secret_message: str) -> str:
     # Calculate bits per line needed
     bits_per_line = 8  # We can encode 4 groups of 2 bits = 8 bits per line
     
-    print(f"[ENCODE] Available lines: {len(lines)}")
-    print(f"[ENCODE] Bits per line: {bits_per_line}")
-    print(f"[ENCODE] Total capacity: {len(lines) * bits_per_line} bits")
-    print(f"[ENCODE] Required capacity: {len(binary_data)} bits")
+    log.debug("[ENCODE] Available lines: %s", len(lines))
+    log.debug("[ENCODE] Bits per line: %s", bits_per_line)
+    log.debug("[ENCODE] Total capacity: %s bits", len(lines) * bits_per_line)
+    log.debug("[ENCODE] Required capacity: %s bits", len(binary_data))
     
-    # Embed binary data as whitespace after each line
-    modified_lines = []
-    bit_index = 0
+    # Embed binary data as whitespace after each line: the whole bit string
+    # is mapped to marks in one translate, then 8 marks (4 groups) per line
+    marks = binary_data.translate(_BITS_TO_MARKS)
+    bit_index = min(len(marks), len(lines) * bits_per_line)
+    modified_lines = [line + marks[i * bits_per_line:(i + 1) * bits_per_line]
+                      for i, line in enumerate(lines)]
     
-    for line in lines:
-        # Encode up to 8 bits per line using 4 groups of 2-char whitespace
-        whitespace = ""
-        for _ in range(4):  # 4 groups of 2 bits each
-            if bit_index + 1 < len(binary_data):
-                two_bits = binary_data[bit_index:bit_index+2]
-                if two_bits == '00':
-                    whitespace += '  '  # 2 spaces
-                elif two_bits == '01':
-                    whitespace += ' \t'  # space + tab
-                elif two_bits == '10':
-                    whitespace += '\t '  # tab + space
-                elif two_bits == '11':
-                    whitespace += '\t\t'  # 2 tabs
-                bit_index += 2
-            elif bit_index < len(binary_data):
-                # Last bit - pad with 0
-                one_bit = binary_data[bit_index]
-                if one_bit == '0':
-                    whitespace += '  '
-                else:
-                    whitespace += ' \t'
-                bit_index += 1
-                break
-        
-        modified_lines.append(line + whitespace)
-    
-    print(f"[ENCODE] Embedded {bit_index} bits across {len(modified_lines)} lines")
+    log.debug("[ENCODE] Embedded %s bits across %s lines", bit_index, len(modified_lines))
     
     return '\n'.join(modified_lines)
 
@@ -91,78 +80,50 @@ def decode_message_from_code(stego_code: str) -> str:
     """
     lines = stego_code.split('\n')
     
-    # Extract binary data from trailing whitespace
-    binary_data = ''
-    for line in lines:
-        # Find trailing whitespace
-        stripped = line.rstrip('\t ')
-        trailing = line[len(stripped):]
-        
-        # Decode in groups of 2 characters
-        i = 0
-        while i + 1 < len(trailing):
-            two_chars = trailing[i:i+2]
-            if two_chars == '  ':
-                binary_data += '00'
-            elif two_chars == ' \t':
-                binary_data += '01'
-            elif two_chars == '\t ':
-                binary_data += '10'
-            elif two_chars == '\t\t':
-                binary_data += '11'
-            i += 2
-        
-        # Handle single trailing character if any
-        if i < len(trailing):
-            if trailing[i] == ' ':
-                binary_data += '0'
-            else:
-                binary_data += '1'
-    
-    print(f"[DECODE] Extracted {len(binary_data)} bits")
-    print(f"[DECODE] Binary (first 64 bits): {binary_data[:64]}")
+    # Extract binary data from trailing whitespace; each group of marks
+    # decodes to its bits directly, so one translate covers every line
+    trailing = ''.join([line[len(line.rstrip('\t ')):] for line in lines])
+    binary_data = trailing.translate(_MARKS_TO_BITS)
     
-    # Convert binary to characters
-    chars = []
-    for i in range(0, len(binary_data), 8):
-        byte = binary_data[i:i+8]
-        if len(byte) == 8:
-            chars.append(chr(int(byte, 2)))
+    log.debug("[DECODE] Extracted %s bits", len(binary_data))
+    log.debug("[DECODE] Binary (first 64 bits): %s", binary_data[:64])
     
-    b64_encrypted = ''.join(chars)
-    print(f"[DECODE] Base64 encrypted: {b64_encrypted}")
+    # Convert whole bytes of binary to bytes in one conversion
+    num_bytes = len(binary_data) // 8
+    b64_encrypted = int(binary_data[:num_bytes * 8] or '0', 2).to_bytes(num_bytes, 'big')
+    log.debug("[DECODE] Base64 encrypted: %r", b64_encrypted)
     
     try:
-        # Decode base64
+        # Decode base64 (binascii.Error is a ValueError)
         encrypted_bytes = base64.b64decode(b64_encrypted)
-        encrypted_message = encrypted_bytes.decode('utf-8')
-        print(f"[DECODE] Encrypted message: {encrypted_message}")
-        
-        # Decrypt
-        key = "QUANTUM_KEY_2026"
-        decrypted = xor_encrypt(encrypted_message, key)
-        
-        return decrypted
-    except Exception as e:
-        print(f"[DECODE] Error: {e}")
+    except ValueError as e:
+        log.warning("[DECODE] Error: %s", e)
         return ""
+    log.debug("[DECODE] Encrypted message: %r", encrypted_bytes)
+    
+    # Decrypt, then decode the plaintext once
+    key = "QUANTUM_KEY_2026"
+    return xor_bytes(encrypted_bytes, key.encode('utf-8')).decode('utf-8', errors='replace')
 
-def xor_encrypt(text: str, key: str) -> str:
+def xor_bytes(data: bytes, key: bytes) -> bytes:
     """Simple XOR encryption (symmetric)"""
-    result = []
-    for i, char in enumerate(text):
-        key_char = key[i % len(key)]
-        result.append(chr(ord(char) ^ ord(key_char)))
-    return ''.join(result)
+    # Tile the key to the data length and XOR both as one bignum operation
+    n = len(data)
+    tiled_key = (key * (n // len(key) + 1))[:n]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(tiled_key, 'big')).to_bytes(n, 'big')
 
-def verify_code_still_works(code: str) -> bool:
-    """Verify the steganographic code is still valid Python"""
+@lru_cache(maxsize=4)
+def compile_code(code: str) -> Optional[CodeType]:
+    """Compile code once; the code object is reused for every check and exec"""
     try:
-        compile(code, '<string>', 'exec')
-        return True
+        return compile(code, '<string>', 'exec')
     except SyntaxError as e:
-        print(f"[VERIFY] Syntax error: {e}")
-        return False
+        log.warning("[VERIFY] Syntax error: %s", e)
+        return None
+
+def verify_code_still_works(code: str) -> bool:
+    """Verify the steganographic code is still valid Python"""
+    return compile_code(code) is not None
 
 # Sample Python program to hide message in
 SAMPLE_PROGRAM = '''def fibonacci(n):
@@ -193,6 +154,9 @@ if __name__ == "__main__":
 '''
 
 if __name__ == "__main__":
+    logging.basicConfig(format="%(message)s", stream=sys.stdout)
+    log.setLevel(logging.DEBUG)
+    
     print("=" * 70)
     print("EXPERIMENT #009: STEGANOGRAPHY IN CODE (v2)")
     print("Hiding encrypted messages in working Python programs")
@@ -224,7 +188,7 @@ if __name__ == "__main__":
     print()
     
     # Save steganographic code
-    with open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_program_v2.py', 'w') as f:
+    with open('/home/ubuntu/unknown-unknown-experiments/experiments/009-steganography-in-code/evidence/stego_program_v2.py', 'w', encoding='utf-8', newline='') as f:
         f.write(stego_code)
     print("[SAVED] Steganographic code saved to evidence/stego_program_v2.py")
     print()
@@ -234,7 +198,7 @@ if __name__ == "__main__":
     print("-" * 70)
     if verify_code_still_works(stego_code):
         print("✓ Code is still valid Python!")
-        exec(stego_code)
+        exec(compile_code(stego_code))
     else:
         print("✗ Code is broken!")
     print("-" * 70)